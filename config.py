@@ -7,6 +7,12 @@ load_dotenv()
 # Telegram Bot 配置
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 
+# Bot API 地址，默认官方服务；部署本地 telegram-bot-api 时可设为 http://127.0.0.1:8081/bot 以省去公网往返
+TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org/bot')
+TELEGRAM_API_BASE_FILE_URL = os.getenv('TELEGRAM_API_BASE_FILE_URL', 'https://api.telegram.org/file/bot')
+# Bot API 的HTTP协议版本："1.1"（默认）或 "2"；HTTP/2 在一条连接上复用并发请求，需安装 httpx[http2]
+TELEGRAM_HTTP_VERSION = os.getenv('TELEGRAM_HTTP_VERSION', '1.1')
+
 # 验证必要的环境变量
 if not TELEGRAM_BOT_TOKEN:
     raise ValueError("TELEGRAM_BOT_TOKEN 环境变量未设置！请检查 .env 文件")
@@ -47,6 +53,10 @@ SUPPORT_RESISTANCE_PERIOD = 50  # 回看近 50 根 K 线高低点
 # ⏱️ Scheduler - 针对全量监控优化
 SIGNAL_CHECK_INTERVAL = 60  # 秒 - 增加到60秒，适配全量监控
 DATA_FETCH_INTERVAL = 60    # 秒
+CONTRACTS_CACHE_TTL = 3600  # 秒 - 合约列表缓存有效期（内存+磁盘）
+WS_STREAM_ENABLED = True    # K线通过WebSocket推送，REST仅用于启动回填
+WS_CANDLE_CAPACITY = 200    # 每个交易对在内存中保留的K线根数
+OHLCV_CACHE_SAVE_INTERVAL = 600  # 秒 - K线磁盘缓存写入间隔，重启时只需补齐缺失的K线
 
 # 支持的交易对列表 - 所有OKX USDT永续合约 (241个)
 TRADING_PAIRS = [
@@ -76,6 +86,9 @@ TRADING_PAIRS = [
     'XCH/USDT', 'XTZ/USDT', 'YFI/USDT', 'YGG/USDT', 'ZENT/USDT', 'ZEREBRO/USDT', 'ZETA/USDT', 'ZIL/USDT', 'ZK/USDT', 'ZRO/USDT', 'ZRX/USDT'
 ]
 
+# 预计算：交易对 -> OKX instId 映射（BTC/USDT -> BTC-USDT）
+OKX_INST_IDS = {pair: pair.replace('/', '-') for pair in TRADING_PAIRS}
+
 # 每个币种对应的Telegram频道ID (需要您创建频道并添加机器人为管理员)
 CHANNELS = {
     'BTC/USDT': '@btczyz_signals_2025',    # BTC信号频道
@@ -1,49 +1,159 @@
 # OKX API数据获取模块
-import requests
+import aiohttp
+import orjson
+from aiolimiter import AsyncLimiter
+import numpy as np
 import pandas as pd
 import asyncio
 import logging
+import os
 import random
+import re
 import time
 from datetime import datetime
-from config import TRADING_PAIRS
+from config import TRADING_PAIRS, OKX_INST_IDS, CONTRACTS_CACHE_TTL, SIGNAL_CHECK_INTERVAL
 from functools import wraps
 
-def async_retry(max_retries=3, base_delay=1.0, max_delay=60.0, backoff_factor=2.0):
+# 杠杆代币等不适合交易的品种（基础币种名包含任一片段即排除），预编译为单个正则
+_EXCLUDE_RE = re.compile(r'UP|DOWN|3L|3S|BEAR|BULL|MOVE')
+
+# 合约列表磁盘缓存，重启后在有效期内可直接复用
+CONTRACTS_CACHE_FILE = os.path.join('.cache', 'okx', 'contracts.json')
+
+# OHLCV数值列（与OKX K线返回的第1-5列对应）
+OHLCV_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# OKX接口分组限速（令牌桶），按官方文档的每IP配额设置，主动限速避免触发50011
+LIMITERS = {
+    'candles': AsyncLimiter(20, 2),      # /api/v5/market/candles
+    'ticker': AsyncLimiter(20, 2),       # /api/v5/market/ticker
+    'tickers': AsyncLimiter(20, 2),      # /api/v5/market/tickers
+    'books': AsyncLimiter(20, 2),        # /api/v5/market/books
+    'instruments': AsyncLimiter(10, 2),  # /api/v5/public/instruments
+}
+
+class OHLCVColumns(dict):
+    """列式OHLCV数据 {'ts': int64数组, 'open'/'high'/'low'/'close'/'volume': float64数组}"""
+    
+    __slots__ = ('_frame',)
+    
+    @property
+    def frame(self):
+        """按需构建的DataFrame（以ts_ms为索引），供仍需pandas的调用方使用"""
+        try:
+            return self._frame
+        except AttributeError:
+            self._frame = pd.DataFrame(
+                {col: self[col] for col in OHLCV_COLUMNS},
+                index=pd.Index(self['ts'], name='ts_ms')
+            )
+            return self._frame
+
+def build_ohlcv(timestamps, values, as_frame=True):
+    """
+    由时间戳和数值列构建OHLCV数据
+    
+    Args:
+        timestamps: 毫秒时间戳数组，按时间升序
+        values: 形如 (N, 5) 的数组，列顺序同 OHLCV_COLUMNS
+        as_frame: True返回DataFrame；False返回列式NumPy数组字典
+        
+    Returns:
+        DataFrame: 以int64毫秒时间戳(ts_ms)为索引的OHLCV数据
+        OHLCVColumns: as_frame=False时为 {'ts': int64数组, 'open'/'high'/'low'/'close'/'volume': float64数组}
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    
+    if not as_frame:
+        # 列式(SoA)布局：每列一段连续内存
+        columns = np.asarray(values).T.astype(np.float64, order='C')
+        ohlcv = OHLCVColumns(zip(OHLCV_COLUMNS, columns))
+        ohlcv['ts'] = timestamps
+        return ohlcv
+    
+    # 索引保持int64毫秒时间戳，需要日历时间时再用 pd.to_datetime(df.index, unit='ms') 转换
+    return pd.DataFrame(
+        np.asarray(values).astype(np.float64),
+        index=pd.Index(timestamps, name='ts_ms'),
+        columns=list(OHLCV_COLUMNS)
+    )
+
+def _parse_levels(levels):
+    """将OKX深度档位 [价格, 数量, 废弃字段, 订单数] 批量转换为 (N, 2) 的float64数组"""
+    return np.asarray(levels, dtype=np.float64).reshape(-1, 4)[:, :2]
+
+class OKXAPIError(Exception):
+    """OKX接口返回的业务错误（code != '0'），如参数错误、权限不足，重试无意义"""
+    
+    def __init__(self, code, msg=''):
+        super().__init__(f"OKX API错误 {code}: {msg}")
+        self.code = code
+        self.msg = msg
+
+class OKXRateLimitError(OKXAPIError):
+    """触发OKX限速（HTTP 429 或 code 50011），可重试"""
+    
+    def __init__(self, code, msg='', retry_after=None):
+        super().__init__(code, msg)
+        self.retry_after = retry_after  # 服务端给出的等待秒数，未给出时为None
+
+def _parse_retry_after(headers):
+    """解析 Retry-After 响应头（秒数），缺失或格式不支持时返回None"""
+    try:
+        return max(0.0, float(headers['Retry-After']))
+    except (KeyError, ValueError):
+        return None
+
+# 触发限速的业务错误码
+RATE_LIMIT_CODES = frozenset({'50011'})
+
+# 可恢复的错误：网络异常、超时、5xx、限速；其他异常直接抛出不重试
+RECOVERABLE_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, OKXRateLimitError)
+
+def async_retry(max_retries=3, base_delay=1.0, max_delay=10.0, backoff_factor=3.0):
     """
-    异步重试装饰器，支持指数退避和随机抖动
+    异步重试装饰器，使用去相关抖动（decorrelated jitter）退避
+    
+    每次延迟在 [base_delay, 上次延迟 × backoff_factor] 之间随机取值并以 max_delay 封顶，
+    大量交易对同时重试时能把重试时间分散开，避免再次集中撞上限速。
+    若异常带有服务端给出的 retry_after（Retry-After 响应头），则按该时间等待。
+    只有 RECOVERABLE_ERRORS 会触发重试，其他异常立即抛出。
     
     Args:
         max_retries: 最大重试次数
         base_delay: 基础延迟时间（秒）
         max_delay: 最大延迟时间（秒）
-        backoff_factor: 退避因子
+        backoff_factor: 延迟上界相对上次延迟的增长倍数
     """
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
             last_exception = None
+            prev_delay = base_delay
             
             for attempt in range(max_retries + 1):
                 try:
                     return await func(*args, **kwargs)
                     
-                except Exception as e:
+                except RECOVERABLE_ERRORS as e:
                     last_exception = e
                     
                     # 最后一次尝试不需要延迟
                     if attempt == max_retries:
                         break
                     
-                    # 计算延迟时间：指数退避 + 随机抖动
-                    delay = min(base_delay * (backoff_factor ** attempt), max_delay)
-                    jitter = random.uniform(0.1, 0.5) * delay
-                    total_delay = delay + jitter
+                    # 计算延迟时间：优先使用服务端给出的等待时间，否则去相关抖动
+                    retry_after = getattr(e, 'retry_after', None)
+                    if retry_after is not None:
+                        total_delay = retry_after
+                    else:
+                        total_delay = min(max_delay, random.uniform(base_delay, prev_delay * backoff_factor))
+                        prev_delay = total_delay
                     
                     # 记录重试信息
                     logger = logging.getLogger(__name__)
-                    logger.warning(f"{func.__name__} 第{attempt + 1}次尝试失败: {e}")
-                    logger.info(f"将在 {total_delay:.2f} 秒后重试...")
+                    logger.warning("%s 第%d次尝试失败: %s", func.__name__, attempt + 1, e)
+                    logger.info("将在 %.2f 秒后重试...", total_delay)
                     
                     await asyncio.sleep(total_delay)
             
@@ -54,20 +164,111 @@ def async_retry(max_retries=3, base_delay=1.0, max_delay=60.0, backoff_factor=2.
     return decorator
 
 class OKXDataFetcher:
-    def __init__(self):
-        """初始化OKX数据获取器"""
+    def __init__(self, concurrent_requests=32):
+        """
+        初始化OKX数据获取器
+        
+        Args:
+            concurrent_requests: 同时在途的最大HTTP请求数
+        """
         self.base_url = "https://www.okx.com"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            'Accept-Encoding': 'gzip, deflate'  # JSON响应压缩传输
+        }
+        self._session = None  # aiohttp会话，在首次请求时创建
+        self._sem = asyncio.Semaphore(concurrent_requests)  # 限制在途请求数
         
         self.logger = logging.getLogger(__name__)
         self._all_contracts = None  # 缓存所有合约数据
+        self._contracts_fetched_at = 0.0  # 合约缓存的获取时间（Unix时间戳）
+        self._contracts_etag = None  # 合约列表响应的ETag，用于条件请求
+        self._inst_ids = dict(OKX_INST_IDS)  # 交易对 -> OKX instId
+        
+    async def _ensure_session(self):
+        """懒加载共享的aiohttp会话（长连接复用）"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                base_url=self.base_url,
+                # 空闲连接保留时间需长于一个监控周期，避免每轮重新TLS握手
+                connector=aiohttp.TCPConnector(
+                    limit=50, ttl_dns_cache=300,
+                    keepalive_timeout=SIGNAL_CHECK_INTERVAL + 15
+                ),
+                headers=self.headers,
+                auto_decompress=True
+            )
+        return self._session
+        
+    async def close(self):
+        """关闭aiohttp会话"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        
+    async def _request(self, path, params, group, timeout=10):
+        """
+        发送受并发和限速约束的GET请求，可恢复的错误自动重试
+        
+        Args:
+            path: API路径，如 '/api/v5/market/candles'
+            params: 查询参数
+            group: 限速分组，对应LIMITERS中的键
+            timeout: 超时时间（秒）
+            
+        Returns:
+            dict: 解析后的响应JSON（orjson直接解析原始字节），code 为 '0'
+            
+        Raises:
+            OKXRateLimitError: 触发限速，重试后仍失败
+            OKXAPIError: 其他业务错误，不重试
+            aiohttp.ClientError: 网络错误或5xx，重试后仍失败
+        """
+        data, _ = await self._get(path, params, group, timeout)
+        return data
+    
+    @async_retry(max_retries=3, base_delay=1.0)
+    async def _get(self, path, params, group, timeout=10, headers=None):
+        """
+        _request 的底层实现，额外支持自定义请求头（如条件请求 If-None-Match）
+        
+        Returns:
+            tuple: (响应JSON，304未修改时为None; 响应头)
+        """
+        session = await self._ensure_session()
+        
+        # 先取限速令牌再占并发名额：某个分组限速等待时不占用其他分组可用的并发名额
+        async with LIMITERS[group], self._sem, session.get(
+            path,
+            params=params,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            retry_after = _parse_retry_after(response.headers)
+            if response.status == 429:
+                raise OKXRateLimitError('429', 'Too Many Requests', retry_after)
+            if response.status >= 500:
+                response.raise_for_status()
+            if response.status == 304:
+                return None, response.headers
+                
+            data = orjson.loads(await response.read())
+            
+        code = data.get('code')
+        if code != '0':
+            if code in RATE_LIMIT_CODES:
+                raise OKXRateLimitError(code, data.get('msg', ''), retry_after)
+            raise OKXAPIError(code, data.get('msg', ''))
+            
+        return data, response.headers
         
     def _convert_symbol(self, symbol):
         """将交易对格式转换为OKX格式 (BTC/USDT -> BTC-USDT)"""
-        return symbol.replace('/', '-')
+        inst_id = self._inst_ids.get(symbol)
+        if inst_id is None:
+            # 动态合约列表中不在静态配置里的交易对，转换一次后缓存
+            inst_id = self._inst_ids[symbol] = symbol.replace('/', '-')
+        return inst_id
         
     async def fetch_all_contracts(self, force_refresh=False):
         """
@@ -79,22 +280,44 @@ class OKXDataFetcher:
         Returns:
             list: 所有USDT本位永续合约列表 ['BTC/USDT', 'ETH/USDT', ...]
         """
-        if self._all_contracts is not None and not force_refresh:
-            return self._all_contracts
+        if not force_refresh:
+            now = time.time()
+            if self._all_contracts and now - self._contracts_fetched_at < CONTRACTS_CACHE_TTL:
+                return self._all_contracts
+                
+            fetched_at, cached, etag = self._load_contracts_cache()
+            if cached and now - fetched_at < CONTRACTS_CACHE_TTL:
+                self._all_contracts = cached
+                self._contracts_fetched_at = fetched_at
+                self._contracts_etag = etag
+                self.logger.info("从磁盘缓存加载 %d 个 USDT本位永续合约", len(cached))
+                return cached
+            
+        if self._all_contracts is None:
+            # 载入已过期的磁盘缓存，用于条件请求（304时直接复用）
+            fetched_at, cached, etag = self._load_contracts_cache()
+            if cached:
+                self._all_contracts = cached
+                self._contracts_fetched_at = fetched_at
+                self._contracts_etag = etag
             
         try:
-            # 只获取USDT本位永续合约
-            swap_symbols = await self._fetch_instruments('SWAP')
+            # 只获取USDT本位永续合约；合约列表未变化时服务端返回304，跳过下载和解析
+            swap_symbols = await self._fetch_instruments('SWAP', conditional=True)
+            if swap_symbols is None:
+                self._contracts_fetched_at = time.time()
+                self._save_contracts_cache()
+                self.logger.info("合约列表未变化，复用缓存的 %d 个 USDT本位永续合约", len(self._all_contracts))
+                return self._all_contracts
             
             # 过滤出USDT本位永续合约
             usdt_swap_symbols = []
-            exclude_patterns = ['UP', 'DOWN', '3L', '3S', 'BEAR', 'BULL', 'MOVE']
             
             for symbol in swap_symbols:
                 if symbol.endswith('/USDT'):
                     base = symbol.replace('/USDT', '')
                     # 过滤掉杠杆代币等不适合交易的品种
-                    if not any(pattern in base for pattern in exclude_patterns):
+                    if not _EXCLUDE_RE.search(base):
                         usdt_swap_symbols.append(symbol)
             
             # 按市值和流动性排序（热门币种优先）
@@ -105,65 +328,92 @@ class OKXDataFetcher:
                 'PEPE', 'ARB', 'OP', 'APT', 'SUI', 'SEI', 'INJ', 'TIA', 'WLD', 'JUP'
             ]
             
-            sorted_symbols = []
-            remaining_symbols = []
-            
-            # 先添加优先币种的永续合约
-            for coin in priority_coins:
-                symbol = f"{coin}/USDT"
-                if symbol in usdt_swap_symbols:
-                    sorted_symbols.append(symbol)
+            # 先添加优先币种的永续合约（集合查找，O(1)成员判断）
+            swap_set = set(usdt_swap_symbols)
+            sorted_symbols = [f"{coin}/USDT" for coin in priority_coins if f"{coin}/USDT" in swap_set]
             
             # 再添加其他永续合约
-            for symbol in usdt_swap_symbols:
-                if symbol not in sorted_symbols:
-                    remaining_symbols.append(symbol)
+            seen = set(sorted_symbols)
+            remaining_symbols = [symbol for symbol in usdt_swap_symbols if symbol not in seen]
             
             # 最终列表：所有USDT本位永续合约
             final_symbols = sorted_symbols + remaining_symbols
+            if not final_symbols:
+                # 接口失败时不覆盖已有缓存
+                raise ValueError("未获取到任何USDT本位永续合约")
             
             self._all_contracts = final_symbols
-            self.logger.info(f"获取到 {len(final_symbols)} 个 USDT本位永续合约")
+            self._contracts_fetched_at = time.time()
+            self._save_contracts_cache()
+            self.logger.info("获取到 %d 个 USDT本位永续合约", len(final_symbols))
             
             return final_symbols
             
         except Exception as e:
-            self.logger.error(f"获取USDT本位永续合约失败: {e}")
-            # 返回默认列表作为备选
-            return TRADING_PAIRS
+            self.logger.error("获取USDT本位永续合约失败: %s", e)
+            # 优先返回已过期的缓存，其次返回默认列表作为备选
+            if self._all_contracts:
+                return self._all_contracts
+            _, cached, _ = self._load_contracts_cache()
+            return cached or TRADING_PAIRS
+    
+    def _load_contracts_cache(self):
+        """
+        读取磁盘上的合约列表缓存
+        
+        Returns:
+            tuple: (获取时间, 合约列表, ETag)，缓存不存在或损坏时为 (0.0, None, None)
+        """
+        try:
+            with open(CONTRACTS_CACHE_FILE, 'rb') as f:
+                cached = orjson.loads(f.read())
+            return cached['fetched_at'], cached['symbols'], cached.get('etag')
+        except FileNotFoundError:
+            return 0.0, None, None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.warning("读取合约缓存失败: %s", e)
+            return 0.0, None, None
     
-    @async_retry(max_retries=2, base_delay=2.0)
-    async def _fetch_instruments(self, inst_type):
+    def _save_contracts_cache(self):
+        """将当前合约列表写入磁盘缓存（先写临时文件再替换，避免读到半截文件）"""
+        try:
+            os.makedirs(os.path.dirname(CONTRACTS_CACHE_FILE), exist_ok=True)
+            tmp_file = CONTRACTS_CACHE_FILE + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(orjson.dumps({
+                    'fetched_at': self._contracts_fetched_at,
+                    'symbols': self._all_contracts,
+                    'etag': self._contracts_etag
+                }))
+            os.replace(tmp_file, CONTRACTS_CACHE_FILE)
+        except OSError as e:
+            self.logger.warning("写入合约缓存失败: %s", e)
+    
+    async def _fetch_instruments(self, inst_type, conditional=False):
         """
         获取指定类型的交易工具
         
         Args:
             inst_type: 'SPOT', 'SWAP', 'FUTURES'
+            conditional: 是否携带合约缓存的ETag发送条件请求（仅用于合约列表缓存）
             
         Returns:
-            list: 交易对列表
+            list: 交易对列表；条件请求命中（304未修改）时为None
         """
         try:
-            url = f"{self.base_url}/api/v5/public/instruments"
             params = {'instType': inst_type}
+            headers = None
+            if conditional and self._contracts_etag and self._all_contracts:
+                headers = {'If-None-Match': self._contracts_etag}
             
-            response = await asyncio.to_thread(
-                self.session.get, 
-                url, 
-                params=params, 
-                timeout=15
+            data, response_headers = await self._get(
+                '/api/v5/public/instruments', params, 'instruments', timeout=15, headers=headers
             )
+            if data is None:
+                return None
+            if conditional:
+                self._contracts_etag = response_headers.get('ETag')
             
-            if response.status_code != 200:
-                self.logger.error(f"获取{inst_type}交易对HTTP错误: {response.status_code}")
-                return []
-                
-            data = response.json()
-            
-            if data.get('code') != '0':
-                self.logger.error(f"获取{inst_type}交易对API错误: {data}")
-                return []
-                
             instruments = data.get('data', [])
             symbols = []
             
@@ -182,15 +432,15 @@ class OKXDataFetcher:
                         symbol = inst_id.replace('-', '/')
                         symbols.append(symbol)
             
-            self.logger.info(f"获取到 {len(symbols)} 个 {inst_type} USDT本位永续合约" if inst_type == 'SWAP' else f"获取到 {len(symbols)} 个 {inst_type} USDT交易对")
+            self.logger.info("获取到 %d 个 %s USDT本位永续合约" if inst_type == 'SWAP' else "获取到 %d 个 %s USDT交易对",
+                             len(symbols), inst_type)
             return symbols
             
         except Exception as e:
-            self.logger.error(f"获取{inst_type}交易对失败: {e}")
+            self.logger.error("获取%s交易对失败: %s", inst_type, e)
             return []
         
-    @async_retry(max_retries=3, base_delay=1.5)
-    async def fetch_ohlcv(self, symbol, timeframe='1m', limit=100):
+    async def fetch_ohlcv(self, symbol, timeframe='1m', limit=100, as_frame=True):
         """
         获取OHLCV数据（开盘价、最高价、最低价、收盘价、成交量）
         
@@ -198,73 +448,43 @@ class OKXDataFetcher:
             symbol: 交易对符号，如 'BTC/USDT'
             timeframe: 时间框架，如 '1m', '5m', '1h'
             limit: 获取的K线数量
+            as_frame: True返回DataFrame；False返回列式NumPy数组字典，
+                      跳过DataFrame构建开销，供指标计算直接使用
             
         Returns:
-            DataFrame: 包含OHLCV数据的DataFrame
+            DataFrame: 包含OHLCV数据的DataFrame（索引为毫秒时间戳ts_ms）
+            dict: as_frame=False时为 {'ts': int64数组, 'open'/'high'/'low'/'close'/'volume': float64数组}
         """
         try:
             okx_symbol = self._convert_symbol(symbol)
             
             # OKX K线API
-            url = f"{self.base_url}/api/v5/market/candles"
             params = {
                 'instId': okx_symbol,
                 'bar': timeframe,
                 'limit': str(limit)
             }
             
-            response = await asyncio.to_thread(
-                self.session.get, 
-                url, 
-                params=params, 
-                timeout=10
-            )
+            data = await self._request('/api/v5/market/candles', params, 'candles')
             
-            if response.status_code != 200:
-                self.logger.error(f"HTTP错误 {response.status_code}: {response.text}")
-                return None
-                
-            data = response.json()
-            
-            if data.get('code') != '0':
-                self.logger.error(f"API错误: {data}")
-                return None
-                
             candles = data.get('data', [])
             if not candles:
-                self.logger.warning(f"没有获取到 {symbol} 的K线数据")
+                self.logger.warning("没有获取到 %s 的K线数据", symbol)
                 return None
             
             # 转换为DataFrame
             # OKX返回格式: [时间戳, 开盘价, 最高价, 最低价, 收盘价, 成交量, 成交额]
-            df_data = []
-            for candle in reversed(candles):  # OKX返回最新的在前，需要反转
-                df_data.append([
-                    int(candle[0]),  # timestamp
-                    float(candle[1]),  # open
-                    float(candle[2]),  # high
-                    float(candle[3]),  # low
-                    float(candle[4]),  # close
-                    float(candle[5])   # volume
-                ])
-            
-            df = pd.DataFrame(
-                df_data, 
-                columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
-            )
+            # 整块按列转换类型，OKX返回最新的在前，需要反转
+            raw = np.asarray(candles)[::-1]
+            ohlcv = build_ohlcv(raw[:, 0].astype(np.int64), raw[:, 1:6], as_frame)
             
-            # 转换时间戳
-            df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms')
-            df.set_index('datetime', inplace=True)
-            
-            self.logger.info(f"成功获取 {symbol} {timeframe} 数据，共 {len(df)} 条记录")
-            return df
+            self.logger.info("成功获取 %s %s 数据，共 %d 条记录", symbol, timeframe, len(raw))
+            return ohlcv
             
         except Exception as e:
-            self.logger.error(f"获取 {symbol} 数据失败: {str(e)}")
+            self.logger.error("获取 %s 数据失败: %s", symbol, e)
             return None
     
-    @async_retry(max_retries=3, base_delay=1.0)
     async def fetch_ticker(self, symbol):
         """
         获取实时ticker数据
@@ -278,50 +498,65 @@ class OKXDataFetcher:
         try:
             okx_symbol = self._convert_symbol(symbol)
             
-            url = f"{self.base_url}/api/v5/market/ticker"
             params = {'instId': okx_symbol}
             
-            response = await asyncio.to_thread(
-                self.session.get, 
-                url, 
-                params=params, 
-                timeout=10
-            )
-            
-            if response.status_code != 200:
-                self.logger.error(f"Ticker HTTP错误 {response.status_code}")
+            data = await self._request('/api/v5/market/ticker', params, 'ticker')
+            if not data.get('data'):
+                self.logger.error("Ticker API错误: %s", data)
                 return None
                 
-            data = response.json()
+            return self._parse_ticker(symbol, data['data'][0], datetime.now().isoformat())
             
-            if data.get('code') != '0' or not data.get('data'):
-                self.logger.error(f"Ticker API错误: {data}")
-                return None
-                
-            ticker_data = data['data'][0]
+        except Exception as e:
+            self.logger.error("获取 %s ticker失败: %s", symbol, e)
+            return None
+    
+    async def fetch_all_tickers(self, inst_type='SWAP'):
+        """
+        一次请求获取某类交易工具的全部ticker，替代逐个交易对请求
+        
+        Args:
+            inst_type: 'SPOT', 'SWAP', 'FUTURES'
             
-            # 转换为标准格式
-            last_price = float(ticker_data['last'])
-            open_price = float(ticker_data['open24h'])
-            percentage_change = ((last_price - open_price) / open_price) * 100 if open_price != 0 else 0
+        Returns:
+            dict: {交易对符号: ticker数据}，仅包含USDT交易对，失败时返回空字典
+        """
+        try:
+            data = await self._request('/api/v5/market/tickers', {'instType': inst_type}, 'tickers')
             
-            ticker = {
-                'symbol': symbol,
-                'last': last_price,
-                'high': float(ticker_data['high24h']),
-                'low': float(ticker_data['low24h']),
-                'baseVolume': float(ticker_data['vol24h']),
-                'percentage': percentage_change,
-                'datetime': datetime.now().isoformat()
-            }
+            suffix = '-USDT-SWAP' if inst_type == 'SWAP' else '-USDT'
+            now = datetime.now().isoformat()
+            tickers = {}
             
-            return ticker
+            for ticker_data in data.get('data', []):
+                inst_id = ticker_data.get('instId', '')
+                if inst_id.endswith(suffix):
+                    symbol = inst_id[:-len(suffix)] + '/USDT'
+                    tickers[symbol] = self._parse_ticker(symbol, ticker_data, now)
+            
+            self.logger.info("批量获取 %d 个 %s ticker", len(tickers), inst_type)
+            return tickers
             
         except Exception as e:
-            self.logger.error(f"获取 {symbol} ticker失败: {str(e)}")
-            return None
+            self.logger.error("批量获取%s ticker失败: %s", inst_type, e)
+            return {}
+    
+    def _parse_ticker(self, symbol, ticker_data, fetched_at):
+        """将OKX ticker转换为标准格式"""
+        last_price = float(ticker_data['last'])
+        open_price = float(ticker_data['open24h'])
+        percentage_change = ((last_price - open_price) / open_price) * 100 if open_price != 0 else 0
+        
+        return {
+            'symbol': symbol,
+            'last': last_price,
+            'high': float(ticker_data['high24h']),
+            'low': float(ticker_data['low24h']),
+            'baseVolume': float(ticker_data['vol24h']),
+            'percentage': percentage_change,
+            'datetime': fetched_at
+        }
     
-    @async_retry(max_retries=2, base_delay=1.0)
     async def fetch_order_book(self, symbol, limit=20):
         """
         获取订单簿数据
@@ -331,29 +566,16 @@ class OKXDataFetcher:
             limit: 深度限制
             
         Returns:
-            dict: 订单簿数据
+            dict: 订单簿数据，bids/asks 为形如 (N, 2) 的float64数组，列为 [价格, 数量]
         """
         try:
             okx_symbol = self._convert_symbol(symbol)
             
-            url = f"{self.base_url}/api/v5/market/books"
             params = {'instId': okx_symbol, 'sz': str(limit)}
             
-            response = await asyncio.to_thread(
-                self.session.get, 
-                url, 
-                params=params, 
-                timeout=10
-            )
-            
-            if response.status_code != 200:
-                self.logger.error(f"订单簿HTTP错误 {response.status_code}")
-                return None
-                
-            data = response.json()
-            
-            if data.get('code') != '0' or not data.get('data'):
-                self.logger.error(f"订单簿API错误: {data}")
+            data = await self._request('/api/v5/market/books', params, 'books')
+            if not data.get('data'):
+                self.logger.error("订单簿API错误: %s", data)
                 return None
                 
             book_data = data['data'][0]
@@ -361,37 +583,41 @@ class OKXDataFetcher:
             # 转换为标准格式
             order_book = {
                 'symbol': symbol,
-                'bids': [[float(bid[0]), float(bid[1])] for bid in book_data['bids']],
-                'asks': [[float(ask[0]), float(ask[1])] for ask in book_data['asks']],
+                'bids': _parse_levels(book_data['bids']),
+                'asks': _parse_levels(book_data['asks']),
                 'timestamp': int(book_data['ts'])
             }
             
             return order_book
             
         except Exception as e:
-            self.logger.error(f"获取 {symbol} 订单簿失败: {str(e)}")
+            self.logger.error("获取 %s 订单簿失败: %s", symbol, e)
             return None
     
-    async def get_market_data(self, symbol, timeframe='1m'):
+    async def get_market_data(self, symbol, timeframe='1m', ticker=None, ohlcv=None, with_order_book=False):
         """
         获取综合市场数据
         
         Args:
             symbol: 交易对符号
             timeframe: 时间框架
+            ticker: 已获取的ticker数据（如来自fetch_all_tickers），为None时单独请求
+            ohlcv: 已获取的列式K线数据（如来自OKXStreamer），为None时单独请求
+            with_order_book: 是否同时获取订单簿，默认不请求（order_book 为None）
             
         Returns:
-            dict: 包含各种市场数据的字典
+            dict: 包含各种市场数据的字典，其中 ohlcv 为列式 OHLCVColumns
         """
         try:
-            # 并行获取数据
-            tasks = [
-                self.fetch_ohlcv(symbol, timeframe, 100),
-                self.fetch_ticker(symbol),
-                self.fetch_order_book(symbol)
-            ]
-            
-            ohlcv_data, ticker_data, order_book_data = await asyncio.gather(*tasks)
+            # 并行获取数据，已提供的部分不再请求
+            async def _given(value):
+                return value
+            
+            ohlcv_data, order_book_data, ticker_data = await asyncio.gather(
+                self.fetch_ohlcv(symbol, timeframe, 100, as_frame=False) if ohlcv is None else _given(ohlcv),
+                self.fetch_order_book(symbol) if with_order_book else _given(None),
+                self.fetch_ticker(symbol) if ticker is None else _given(ticker)
+            )
             
             return {
                 'ohlcv': ohlcv_data,
@@ -403,7 +629,7 @@ class OKXDataFetcher:
             }
             
         except Exception as e:
-            self.logger.error(f"获取 {symbol} 综合数据失败: {str(e)}")
+            self.logger.error("获取 %s 综合数据失败: %s", symbol, e)
             return None
     
     def get_swap_trading_url(self, symbol):
@@ -422,35 +648,16 @@ class OKXDataFetcher:
             swap_symbol = base_symbol + "-swap"  # btc-usdt-swap
             return f"https://www.okx.com/trade-swap/{swap_symbol}"
         except Exception as e:
-            self.logger.error(f"生成交易链接失败: {e}")
+            self.logger.error("生成交易链接失败: %s", e)
             return f"https://www.okx.com/trade-swap/btc-usdt-swap"
     
-    def get_supported_symbols(self):
+    async def get_supported_symbols(self):
         """获取支持的交易对列表"""
-        try:
-            # 验证交易对是否存在
-            url = f"{self.base_url}/api/v5/public/instruments"
-            params = {'instType': 'SWAP'}  # 改为验证永续合约
-            
-            response = self.session.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('code') == '0':
-                    instruments = data.get('data', [])
-                    available_symbols = []
-                    
-                    for symbol in TRADING_PAIRS:
-                        okx_symbol = self._convert_symbol(symbol)
-                        for inst in instruments:
-                            if inst.get('instId') == okx_symbol:
-                                available_symbols.append(symbol)
-                                break
-                    
-                    self.logger.info(f"验证的永续合约: {available_symbols}")
-                    return available_symbols
-                    
-        except Exception as e:
-            self.logger.error(f"获取支持的永续合约失败: {str(e)}")
-            
-        return TRADING_PAIRS  # 返回默认列表 
\ No newline at end of file
+        # 复用合约列表接口，返回格式已统一为 'BTC/USDT'
+        available = set(await self._fetch_instruments('SWAP'))
+        if not available:
+            return TRADING_PAIRS  # 返回默认列表
+        
+        available_symbols = [symbol for symbol in TRADING_PAIRS if symbol in available]
+        self.logger.info("验证的永续合约: %s", available_symbols)
+        return available_symbols
@@ -0,0 +1,316 @@
+# OKX WebSocket K线推送模块
+import aiohttp
+import orjson
+import numpy as np
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from config import WS_CANDLE_CAPACITY, OHLCV_CACHE_SAVE_INTERVAL
+from data_fetcher_okx import build_ohlcv, OHLCV_COLUMNS
+
+# K线频道在business端点推送
+WS_BUSINESS_URL = 'wss://ws.okx.com:8443/ws/v5/business'
+
+# 单条订阅消息携带的交易对数量
+SUBSCRIBE_BATCH = 100
+
+# OKX在30秒无数据时断开连接，超过该时间未收到消息即发送ping保活
+PING_INTERVAL = 25
+
+# 最新K线落后当前时间超过该根数时，缓冲区视为过期
+STALE_BARS = 2
+
+# K线磁盘缓存目录，每个 (交易对, 时间框架) 一个 .npy 文件，列为 [ts, o, h, l, c, v]
+OHLCV_CACHE_DIR = os.path.join('.cache', 'okx', 'ohlcv')
+
+# K线时间框架单位对应的毫秒数（OKX格式: 1m / 1H / 1D，兼容小写h/d）
+_TIMEFRAME_UNIT_MS = {'m': 60_000, 'H': 3_600_000, 'h': 3_600_000, 'D': 86_400_000, 'd': 86_400_000}
+
+
+def _timeframe_ms(timeframe):
+    """时间框架对应的单根K线毫秒数，如 '1m' -> 60000"""
+    return int(timeframe[:-1]) * _TIMEFRAME_UNIT_MS[timeframe[-1]]
+
+
+class RingOHLCV:
+    """
+    单个交易对的K线环形缓冲区（列式存储）
+
+    每列预分配 2*capacity 长度并在 i 与 i+capacity 两处同时写入，
+    因此任意最近 n 根K线在内存中始终连续，读取时返回视图而无需拷贝。
+    """
+
+    __slots__ = ('ts', 'o', 'h', 'l', 'c', 'v', 'head', 'size', 'capacity')
+
+    def __init__(self, capacity=WS_CANDLE_CAPACITY):
+        self.capacity = capacity
+        self.ts = np.zeros(2 * capacity, dtype=np.int64)
+        self.o = np.zeros(2 * capacity, dtype=np.float64)
+        self.h = np.zeros(2 * capacity, dtype=np.float64)
+        self.l = np.zeros(2 * capacity, dtype=np.float64)
+        self.c = np.zeros(2 * capacity, dtype=np.float64)
+        self.v = np.zeros(2 * capacity, dtype=np.float64)
+        self.head = 0  # 下一根K线的写入位置
+        self.size = 0
+
+    @property
+    def last_ts(self):
+        """最新K线的开始时间（毫秒），缓冲区为空时为0"""
+        return int(self.ts[self.head - 1 + self.capacity]) if self.size else 0
+
+    def push(self, row):
+        """
+        写入一根K线：时间戳相同则覆盖最新一根（未收盘K线更新），更新则追加
+
+        Args:
+            row: (ts, open, high, low, close, volume)，与OKX K线前六列一致
+
+        Returns:
+            bool: 是否追加了新K线
+        """
+        ts = int(row[0])
+        last_ts = self.last_ts
+        if self.size and ts < last_ts:
+            return False  # 乱序的旧K线直接丢弃
+
+        appended = not self.size or ts > last_ts
+        if appended:
+            pos = self.head
+            self.head = (pos + 1) % self.capacity
+            self.size = min(self.size + 1, self.capacity)
+        else:
+            pos = (self.head - 1) % self.capacity
+
+        for col, value in zip((self.ts, self.o, self.h, self.l, self.c, self.v), row):
+            col[pos] = value
+            col[pos + self.capacity] = value
+        return appended
+
+    def _view(self, col, n=None):
+        """返回某列最近 n 根K线的连续视图（按时间升序）"""
+        n = self.size if n is None else min(n, self.size)
+        end = self.head + self.capacity
+        return col[end - n:end]
+
+    def to_rows(self):
+        """当前窗口的K线拷贝为 (N, 6) float64数组，列为 [ts, o, h, l, c, v]"""
+        return np.column_stack([self._view(col) for col in (self.ts, self.o, self.h, self.l, self.c, self.v)]).astype(np.float64)
+
+    def to_ohlcv(self, as_frame=True):
+        """拷贝出当前窗口的K线数据，格式同 OKXDataFetcher.fetch_ohlcv"""
+        values = np.column_stack([self._view(col) for col in (self.o, self.h, self.l, self.c, self.v)])
+        return build_ohlcv(self._view(self.ts).copy(), values, as_frame)
+
+
+class OKXStreamer:
+    """通过WebSocket维护各交易对最近K线的内存缓冲，REST仅用于启动回填"""
+
+    def __init__(self, data_fetcher, timeframe='1m', capacity=WS_CANDLE_CAPACITY):
+        self.data_fetcher = data_fetcher
+        self.timeframe = timeframe
+        self.capacity = capacity
+        self.channel = f'candle{timeframe}'
+        self._bar_ms = _timeframe_ms(timeframe)
+        self.logger = logging.getLogger(__name__)
+
+        # 交易对 -> RingOHLCV
+        self.buffers = {}
+
+        # instId -> 交易对符号
+        self._symbols = {}
+        self._session = None
+        self._save_task = None
+        self._running = False
+
+    def get_ohlcv(self, symbol, min_bars=50, as_frame=True):
+        """
+        读取缓冲区中的K线数据
+
+        Args:
+            symbol: 交易对符号
+            min_bars: 最少K线根数，不足时返回None（由调用方回退到REST）
+            as_frame: 返回格式，同 OKXDataFetcher.fetch_ohlcv
+
+        Returns:
+            DataFrame/dict: K线数据，不可用或已过期时返回None
+        """
+        buffer = self.buffers.get(symbol)
+        if buffer is None or buffer.size < min_bars:
+            return None
+        if time.time() * 1000 - buffer.last_ts > STALE_BARS * self._bar_ms:
+            return None  # 推送中断，缓冲区数据已过期
+        return buffer.to_ohlcv(as_frame)
+
+    def _cache_path(self, symbol):
+        """交易对K线缓存文件路径"""
+        inst_id = self.data_fetcher._convert_symbol(symbol)
+        return os.path.join(OHLCV_CACHE_DIR, f'{inst_id}_{self.timeframe}.npy')
+
+    def _load_cache(self, symbol):
+        """从磁盘缓存（内存映射）载入K线，返回载入的根数"""
+        try:
+            rows = np.load(self._cache_path(symbol), mmap_mode='r')
+        except (OSError, ValueError):
+            return 0
+        buffer = self.buffers[symbol]
+        for row in rows[-self.capacity:]:
+            buffer.push(row)
+        return buffer.size
+
+    async def save_cache(self):
+        """将各交易对当前窗口写入磁盘缓存：在事件循环中拷贝数据，文件写入放到线程中执行"""
+        snapshot = [(self._cache_path(symbol), buffer.to_rows())
+                    for symbol, buffer in self.buffers.items() if buffer.size]
+        await asyncio.to_thread(self._write_cache, snapshot)
+
+    def _write_cache(self, snapshot):
+        """写入K线缓存文件（先写临时文件再替换，中途崩溃不会留下截断的文件）"""
+        # 临时文件名带线程ID：停止时的写入可能与被取消的定期写入同时进行
+        suffix = f'.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(OHLCV_CACHE_DIR, exist_ok=True)
+            for path, rows in snapshot:
+                with open(path + suffix, 'wb') as f:
+                    np.save(f, rows)
+                os.replace(path + suffix, path)
+        except OSError as e:
+            self.logger.warning("写入K线缓存失败: %s", e)
+
+    async def backfill(self, symbols):
+        """回填各交易对的历史K线：先载入磁盘缓存，再通过REST补齐缓存之后的K线"""
+        for symbol in symbols:
+            self._load_cache(symbol)
+        await self._fetch_tail(symbols)
+        ready = sum(1 for symbol in symbols if self.buffers[symbol].size)
+        self.logger.info("K线回填完成: %d/%d 个交易对", ready, len(symbols))
+
+    async def _fetch_tail(self, symbols):
+        """通过REST补齐各交易对最新K线之后缺失的部分，缓冲区为空时拉取完整窗口"""
+        now_ms = int(time.time() * 1000)
+
+        async def _fill(symbol):
+            buffer = self.buffers[symbol]
+            limit = self.capacity
+            if buffer.size:
+                # 最新K线之后缺失的K线数，包含最新一根（可能尚未收盘）
+                missing = (now_ms - buffer.last_ts) // self._bar_ms + 1
+                limit = int(min(self.capacity, max(missing, 1)))
+            ohlcv = await self.data_fetcher.fetch_ohlcv(
+                symbol, self.timeframe, limit, as_frame=False
+            )
+            if ohlcv is not None:
+                for row in zip(ohlcv['ts'], *(ohlcv[col] for col in OHLCV_COLUMNS)):
+                    buffer.push(row)
+
+        await asyncio.gather(*(_fill(symbol) for symbol in symbols))
+
+    async def _save_loop(self):
+        """定期写入K线磁盘缓存"""
+        while self._running:
+            await asyncio.sleep(OHLCV_CACHE_SAVE_INTERVAL)
+            await self.save_cache()
+
+    async def run(self, symbols):
+        """
+        启动推送：回填历史K线后保持WebSocket订阅，断线自动重连
+
+        Args:
+            symbols: 交易对符号列表
+        """
+        self._running = True
+        self._symbols = {self.data_fetcher._convert_symbol(s): s for s in symbols}
+        self.buffers = {s: RingOHLCV(self.capacity) for s in symbols}
+
+        await self.backfill(symbols)
+        self._save_task = asyncio.create_task(self._save_loop())
+
+        delay = 1.0
+        reconnect = False
+        while self._running:
+            try:
+                await self._listen(refill=reconnect)
+                delay = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self._running:
+                    break
+                self.logger.warning("WebSocket连接中断: %s，%.1f秒后重连", e, delay)
+            reconnect = True
+
+            if self._running:
+                await asyncio.sleep(delay)
+                delay = min(30.0, random.uniform(1.0, delay * 3))
+
+    async def _listen(self, refill=False):
+        """
+        建立连接、订阅并处理推送消息
+
+        Args:
+            refill: 重连时为True，订阅后先通过REST补齐断线期间错过的K线
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+
+        async with self._session.ws_connect(WS_BUSINESS_URL, heartbeat=None) as ws:
+            inst_ids = list(self._symbols)
+            for i in range(0, len(inst_ids), SUBSCRIBE_BATCH):
+                args = [{'channel': self.channel, 'instId': inst_id}
+                        for inst_id in inst_ids[i:i + SUBSCRIBE_BATCH]]
+                await ws.send_bytes(orjson.dumps({'op': 'subscribe', 'args': args}))
+            self.logger.info("已订阅 %d 个交易对的 %s 推送", len(inst_ids), self.channel)
+
+            if refill:
+                # 补齐期间的推送暂存在连接中，补齐后按序处理，新K线不会被REST数据覆盖
+                await self._fetch_tail(list(self.buffers))
+                self.logger.info("重连后已补齐 %d 个交易对的K线", len(self.buffers))
+
+            pinged = False
+            while self._running:
+                try:
+                    msg = await ws.receive(timeout=PING_INTERVAL)
+                except asyncio.TimeoutError:
+                    # 发送ping后又一个周期仍无任何消息（含pong），连接已半开失效，主动重连
+                    if pinged:
+                        raise ConnectionError(f"超过{2 * PING_INTERVAL}秒未收到消息")
+                    await ws.send_str('ping')
+                    pinged = True
+                    continue
+
+                pinged = False
+                if msg.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                    if msg.data == 'pong':
+                        continue
+                    self._on_message(orjson.loads(msg.data))
+                elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED,
+                                  aiohttp.WSMsgType.ERROR):
+                    raise ConnectionError(f"连接已关闭: {ws.close_code}")
+
+    def _on_message(self, message):
+        """处理单条推送消息"""
+        if message.get('event') == 'error':
+            self.logger.warning("订阅失败: %s %s", message.get('code'), message.get('msg'))
+            return
+
+        symbol = self._symbols.get(message.get('arg', {}).get('instId'))
+        if symbol is None or 'data' not in message:
+            return
+
+        # 每条K线: [ts, o, h, l, c, vol, volCcy, volCcyQuote, confirm]
+        buffer = self.buffers[symbol]
+        for candle in message['data']:
+            buffer.push((int(candle[0]), *map(float, candle[1:6])))
+
+    async def stop(self):
+        """停止推送、写入K线缓存并关闭连接"""
+        self._running = False
+        if self._save_task is not None:
+            self._save_task.cancel()
+            self._save_task = None
+        await self.save_cache()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
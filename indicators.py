@@ -0,0 +1,119 @@
+# 增量技术指标模块
+import numpy as np
+from config import RSI_PERIOD
+
+try:
+    from numba import njit
+except ImportError:  # numba为可选依赖，未安装时以纯Python执行同一套内核
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+@njit(cache=True)
+def rsi_value(avg_gain, avg_loss):
+    """由平均涨跌幅计算RSI"""
+    if avg_loss == 0.0:
+        return 100.0 if avg_gain > 0.0 else 50.0
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+# RSI/均线状态数组的槽位：已计入K线数、Wilder平均涨跌幅、各窗口内的累加和
+RM_COUNT, RM_GAIN, RM_LOSS, RM_SHORT, RM_LONG, RM_VOL = range(6)
+RM_STATE_SIZE = 6
+
+
+@njit(cache=True, nogil=True)
+def rsi_ma_step(state, close, volume, i, rsi_period, ma_short, ma_long, vol_period):
+    """
+    把第 i 根K线计入RSI/均线状态（O(1)）
+
+    窗口累加和加入第 i 根、减去移出窗口的那根，因此数组中需包含第 i-1 根
+    及第 i-周期 根K线。前 rsi_period 根以简单平均起步，之后为Wilder平滑。
+    """
+    count = state[RM_COUNT] + 1.0
+    x = close[i]
+    if count > 1.0:
+        k = min(count - 1.0, rsi_period)
+        diff = x - close[i - 1]
+        state[RM_GAIN] = (state[RM_GAIN] * (k - 1) + max(diff, 0.0)) / k
+        state[RM_LOSS] = (state[RM_LOSS] * (k - 1) + max(-diff, 0.0)) / k
+    state[RM_SHORT] += x
+    if count > ma_short:
+        state[RM_SHORT] -= close[i - ma_short]
+    state[RM_LONG] += x
+    if count > ma_long:
+        state[RM_LONG] -= close[i - ma_long]
+    state[RM_VOL] += volume[i]
+    if count > vol_period:
+        state[RM_VOL] -= volume[i - vol_period]
+    state[RM_COUNT] = count
+
+
+@njit(cache=True, nogil=True)
+def rsi_ma_seed(state, close, volume, end, rsi_period, ma_short, ma_long, vol_period):
+    """用前 end 根K线从头初始化RSI/均线状态"""
+    state[:] = 0.0
+    for i in range(end):
+        rsi_ma_step(state, close, volume, i, rsi_period, ma_short, ma_long, vol_period)
+
+
+@njit(cache=True, nogil=True)
+def rsi_ma_values(state, close, volume, rsi_period, ma_short, ma_long, vol_period):
+    """
+    在截至倒数第二根K线的状态上叠加最新一根，计算当前指标值（不修改状态）
+
+    Returns:
+        tuple: (rsi, ma_fast, ma_slow, vol_ma, last_vol, prev_close)
+    """
+    live = state.copy()
+    n = close.shape[0]
+    rsi_ma_step(live, close, volume, n - 1, rsi_period, ma_short, ma_long, vol_period)
+    count = live[RM_COUNT]
+    return (rsi_value(live[RM_GAIN], live[RM_LOSS]), live[RM_SHORT] / min(count, ma_short),
+            live[RM_LONG] / min(count, ma_long), live[RM_VOL] / min(count, vol_period),
+            volume[n - 1], close[n - 2])
+
+
+@njit(cache=True, fastmath=True)
+def simple_rsi_ma(close, rsi_period, ma_short, ma_long):
+    """
+    快速分析用：最近 rsi_period 个涨跌幅简单平均的RSI、两条简单均线和最新一根的涨跌幅
+
+    Args:
+        close: 收盘价数组（float64，按时间升序，长度需大于各周期）
+        rsi_period: RSI周期
+        ma_short: 快速均线周期
+        ma_long: 慢速均线周期
+
+    Returns:
+        tuple: (rsi, ma_fast, ma_slow, price_change_pct)
+    """
+    n = close.shape[0]
+    gain = 0.0
+    loss = 0.0
+    for i in range(n - rsi_period, n):
+        diff = close[i] - close[i - 1]
+        if diff > 0.0:
+            gain += diff
+        else:
+            loss -= diff
+    fast = 0.0
+    for i in range(n - ma_short, n):
+        fast += close[i]
+    slow = 0.0
+    for i in range(n - ma_long, n):
+        slow += close[i]
+    change = (close[n - 1] - close[n - 2]) / close[n - 2] * 100.0
+    return rsi_value(gain / rsi_period, loss / rsi_period), fast / ma_short, slow / ma_long, change
+
+
+def warmup():
+    """预先触发JIT编译，避免首次实时计算时的编译延迟"""
+    closes = np.linspace(1.0, 2.0, RSI_PERIOD + 5)
+    state = np.zeros(RM_STATE_SIZE, dtype=np.float64)
+    rsi_ma_seed(state, closes, closes, closes.shape[0] - 2, RSI_PERIOD, 3, 5, 3)
+    rsi_ma_step(state, closes, closes, closes.shape[0] - 2, RSI_PERIOD, 3, 5, 3)
+    rsi_ma_values(state, closes, closes, RSI_PERIOD, 3, 5, 3)
+    simple_rsi_ma(closes, 3, 3, 5)
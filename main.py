@@ -8,6 +8,7 @@ import asyncio
 import logging
 import time
 from datetime import datetime
+from functools import lru_cache
 from typing import Dict, List
 import pandas as pd
 import numpy as np
@@ -15,8 +16,59 @@ import numpy as np
 from signal_tracker_v2 import ImprovedSignalTracker
 from telegram_bot_enhanced import EnhancedTelegramBot
 from data_fetcher_okx import OKXDataFetcher
+from data_stream_okx import OKXStreamer
+from indicators import rsi_ma_seed, rsi_ma_step, rsi_ma_values, RM_STATE_SIZE, warmup
 from config import *
 
+try:
+    import uvloop
+except ImportError:  # uvloop为可选依赖（不支持Windows），未安装时使用asyncio默认事件循环
+    uvloop = None
+
+# 信号优先级档位：(最低置信度, 优先级, 描述)，按阈值从高到低匹配
+_PRIORITY_BUCKETS = (
+    (0.8, 'EXTREME', '极强信号'),
+    (0.65, 'HIGH', '强信号'),
+    (0.5, 'MEDIUM', '中信号'),
+)
+
+# 发出信号的最低置信度，与最低优先级档位一致，低于此值的信号在分析阶段即被丢弃
+_MIN_CONFIDENCE = _PRIORITY_BUCKETS[-1][0]
+
+_DIRECTION_TEXT = {'LONG': '做多', 'SHORT': '做空'}
+
+_TIME_FMT = '%H:%M:%S'  # 消息中的信号时间格式
+
+# 信号分析只需要的K线尾部长度：最长指标周期的3倍留给Wilder平滑收敛，另加少量余量
+INDICATOR_TAIL = max(RSI_PERIOD, MA_LONG, VOLUME_SMA_PERIOD) * 3 + 5
+
+# Telegram信号消息模板
+_MSG_TMPL = """{priority_desc} - {coin}
+
+方向: {direction_text}
+价格: ${price:.6f}
+置信度: {confidence:.1%}
+
+技术指标:
+• RSI: {rsi:.1f}
+• 价格变化: {price_change:.2f}%
+• 24H涨跌: {percentage:.2f}%
+
+交易链接: {trading_url}
+时间: {time}"""
+
+def _priority_bucket(confidence: float):
+    """返回置信度对应的 (优先级, 描述)；信号置信度不低于 _MIN_CONFIDENCE，总能落在某一档"""
+    for threshold, priority, priority_desc in _PRIORITY_BUCKETS[:-1]:
+        if confidence >= threshold:
+            return priority, priority_desc
+    return _PRIORITY_BUCKETS[-1][1:]
+
+@lru_cache(maxsize=None)
+def _display_symbol(symbol: str) -> str:
+    """交易对的展示名称（BTC/USDT -> BTC）"""
+    return symbol.replace('/USDT', '')
+
 class SimpleOKXMonitor:
     """OKX监控器"""
     
@@ -26,6 +78,7 @@ class SimpleOKXMonitor:
         
         # 核心组件
         self.data_fetcher = OKXDataFetcher()
+        self.streamer = OKXStreamer(self.data_fetcher) if WS_STREAM_ENABLED else None
         self.signal_tracker = ImprovedSignalTracker()
         self.telegram_bot = EnhancedTelegramBot()
         
@@ -34,8 +87,15 @@ class SimpleOKXMonitor:
         self.running = False
         
         # 性能优化配置
-        self.max_concurrent_requests = 5  # 进一步降低并发数避免429错误
-        self.semaphore = None  # 将在start()中创建
+        self.max_concurrent_requests = 5  # 工作协程数量，进一步降低并发数避免429错误
+        self._queue = None  # 待处理交易对队列，将在start()中创建
+        self._bg_tasks: List[asyncio.Task] = []  # start()中创建的后台任务（工作协程、K线推送、机器人），停止时统一取消
+        self._cycle_stats = {'signals': 0, 'errors': 0}  # 本轮处理统计
+        
+        # 指标状态缓存：交易对 -> {'last_ts': 已计入的最后一根已收盘K线时间戳, 'state': RSI/均线状态数组}
+        self._indicator_state: Dict[str, Dict] = {}
+        # 上次分析的输入：交易对 -> (最新K线时间戳, 最新价)，未变化时跳过分析
+        self._last_seen: Dict[str, tuple] = {}
         
     def setup_logging(self):
         """设置日志"""
@@ -53,47 +113,58 @@ class SimpleOKXMonitor:
         try:
             self.logger.info("正在获取最新的USDT永续合约列表...")
             
-            # 获取动态合约列表
-            dynamic_symbols = await self.data_fetcher.fetch_all_contracts(force_refresh=True)
+            # 获取动态合约列表（缓存有效期内直接复用，重启无需重新下载）
+            dynamic_symbols = await self.data_fetcher.fetch_all_contracts()
             
             if dynamic_symbols and len(dynamic_symbols) > 0:
                 self.symbols = dynamic_symbols
-                self.logger.info(f"✅ 动态获取到 {len(self.symbols)} 个活跃USDT永续合约")
+                self.logger.info("✅ 动态获取到 %d 个活跃USDT永续合约", len(self.symbols))
                 
                 # 显示前20个合约作为示例
                 sample_symbols = [s.replace('/USDT', '') for s in self.symbols[:20]]
-                self.logger.info(f"📋 合约示例: {', '.join(sample_symbols)}...")
+                self.logger.info("📋 合约示例: %s...", ', '.join(sample_symbols))
                 
             else:
                 # 后备方案：使用静态列表
                 self.symbols = TRADING_PAIRS
-                self.logger.warning(f"⚠️ 动态获取失败，使用静态列表: {len(self.symbols)} 个合约")
+                self.logger.warning("⚠️ 动态获取失败，使用静态列表: %d 个合约", len(self.symbols))
                 
         except Exception as e:
             # 后备方案：使用静态列表
             self.symbols = TRADING_PAIRS
-            self.logger.error(f"❌ 动态获取合约失败: {e}")
-            self.logger.info(f"🔄 使用静态后备列表: {len(self.symbols)} 个合约")
+            self.logger.error("❌ 动态获取合约失败: %s", e)
+            self.logger.info("🔄 使用静态后备列表: %d 个合约", len(self.symbols))
 
     async def start(self):
         """启动监控系统"""
         self.logger.info("启动OKX监控系统")
         
         try:
-            # 创建并发限制信号量
-            self.semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+            # 创建固定数量的工作协程，从队列中逐个取交易对处理
+            self._queue = asyncio.Queue()
+            self._bg_tasks.extend(
+                asyncio.create_task(self._worker())
+                for _ in range(self.max_concurrent_requests)
+            )
+            
+            # 预先编译指标内核，避免首轮分析时的JIT延迟
+            warmup()
             
             # 动态获取合约列表
             await self.init_symbols()
             
+            # 启动K线推送（REST回填后由WebSocket增量更新）
+            if self.streamer:
+                self._bg_tasks.append(asyncio.create_task(self.streamer.run(self.symbols)))
+            
             # 启动Telegram机器人
-            asyncio.create_task(self.telegram_bot.run())
+            self._bg_tasks.append(asyncio.create_task(self.telegram_bot.run()))
             await asyncio.sleep(3)  # 等待机器人启动
             
             # 日志输出监控范围
-            self.logger.info(f"🚀 准备开始监控 {len(self.symbols)} 个USDT永续合约")
-            self.logger.info(f"⚡ 并发限制: {self.max_concurrent_requests} 个请求")
-            self.logger.info(f"⏰ 监控间隔: {SIGNAL_CHECK_INTERVAL} 秒")
+            self.logger.info("🚀 准备开始监控 %d 个USDT永续合约", len(self.symbols))
+            self.logger.info("⚡ 并发限制: %d 个请求", self.max_concurrent_requests)
+            self.logger.info("⏰ 监控间隔: %s 秒", SIGNAL_CHECK_INTERVAL)
             
             # 开始监控循环
             self.running = True
@@ -102,153 +173,201 @@ class SimpleOKXMonitor:
         except KeyboardInterrupt:
             self.logger.info("收到停止信号")
         except Exception as e:
-            self.logger.error(f"系统错误: {e}")
+            self.logger.error("系统错误: %s", e)
             raise
         finally:
             await self.stop()
 
     async def monitoring_loop(self):
         """主监控循环"""
-        self.logger.info(f"开始监控 {len(self.symbols)} 个合约")
+        self.logger.info("开始监控 %d 个合约", len(self.symbols))
         
+        # 按固定节拍调度：每轮截止时间 = 起点 + k·间隔，处理耗时不会累加到周期上
+        deadline = time.monotonic()
         while self.running:
             try:
                 await self.process_contracts()
-                await asyncio.sleep(SIGNAL_CHECK_INTERVAL)  # 使用配置文件参数
-                
             except Exception as e:
-                self.logger.error(f"监控错误: {e}")
-                await asyncio.sleep(SIGNAL_CHECK_INTERVAL)
+                self.logger.error("监控错误: %s", e)
+            
+            deadline += SIGNAL_CHECK_INTERVAL
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # 本轮超时，立即开始下一轮并以当前时间重新对齐，避免连续补跑
+                self.logger.warning("本轮处理超出检查间隔 %.1fs，立即开始下一轮", -delay)
+                deadline = time.monotonic()
 
     async def process_contracts(self):
         """处理合约数据 - 并发批量处理"""
         
-        # 创建并发处理任务
-        tasks = []
-        for symbol in self.symbols:
-            task = self.process_single_contract(symbol)
-            tasks.append(task)
+        # 每轮一次批量获取全部现货ticker，取代逐个交易对请求；与K线同为现货instId，价格口径一致
+        tickers = await self.data_fetcher.fetch_all_tickers('SPOT')
         
-        # 并发执行所有任务
-        start_time = datetime.now()
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # 用本轮ticker价格评估已发出的信号，追踪完成的信号从活跃槽位释放
+        if tickers:
+            self.signal_tracker.update_prices({symbol: t['last'] for symbol, t in tickers.items()})
         
-        # 统计处理结果
-        success_count = sum(1 for r in results if r is not None and not isinstance(r, Exception))
-        error_count = sum(1 for r in results if isinstance(r, Exception))
-        duration = (datetime.now() - start_time).total_seconds()
+        # 交易对放入队列，由工作协程并发处理，每个交易对分析完立即发送信号
+        start = time.perf_counter()
+        self._cycle_stats = {'signals': 0, 'errors': 0}
+        for symbol in self.symbols:
+            self._queue.put_nowait((symbol, tickers.get(symbol)))
+        await self._queue.join()
         
-        self.logger.info(f"批量处理完成: 成功 {success_count}/{len(self.symbols)} 个合约，"
-                        f"耗时 {duration:.2f}秒，错误 {error_count} 个")
+        # 统计处理结果
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.info("批量处理完成: 成功 %d/%d 个合约，耗时 %.2f秒，错误 %d 个",
+                             self._cycle_stats['signals'], len(self.symbols),
+                             time.perf_counter() - start, self._cycle_stats['errors'])
     
-    async def process_single_contract(self, symbol: str):
-        """处理单个合约数据 - 带并发限制"""
-        async with self.semaphore:  # 限制并发数
+    async def _worker(self):
+        """工作协程：持续从队列取交易对处理，并发数由工作协程数量决定"""
+        while True:
+            symbol, ticker = await self._queue.get()
             try:
-                # 获取市场数据
-                market_data = await self.data_fetcher.get_market_data(symbol)
-                
-                if market_data and market_data['ohlcv'] is not None:
-                    # 信号分析
-                    signal = self.analyze_simple_signal(symbol, market_data)
-                    
-                    if signal:
-                        await self.handle_signal(symbol, signal, market_data)
-                        return signal
-                
-                return None
-                
-            except Exception as e:
-                self.logger.debug(f"处理 {symbol} 失败: {e}")
-                raise e
+                if await self._fetch_analyze_emit(symbol, ticker):
+                    self._cycle_stats['signals'] += 1
+            except Exception:
+                self._cycle_stats['errors'] += 1
+            finally:
+                self._queue.task_done()
+    
+    async def _fetch_analyze_emit(self, symbol: str, ticker: Dict = None):
+        """获取单个合约数据并分析，产生信号时立即处理，不等待本轮其他交易对"""
+        market_data = await self.fetch_contract_data(symbol, ticker)
+        if market_data is None:
+            return None
+        
+        signal = self.analyze_signal(symbol, market_data)
+        if signal:
+            await self.handle_signal(symbol, signal, market_data)
+        return signal
+    
+    async def fetch_contract_data(self, symbol: str, ticker: Dict = None):
+        """获取单个合约的市场数据，K线不可用时返回None"""
+        try:
+            # 获取市场数据（推送K线或批量ticker缺失时由get_market_data单独请求）
+            ohlcv = self.streamer.get_ohlcv(symbol, as_frame=False) if self.streamer else None
+            market_data = await self.data_fetcher.get_market_data(symbol, ticker=ticker, ohlcv=ohlcv)
+            
+            if market_data and market_data['ohlcv'] is not None:
+                return market_data
+            
+            return None
+            
+        except Exception as e:
+            self.logger.debug("处理 %s 失败: %s", symbol, e)
+            raise e
 
-    def analyze_simple_signal(self, symbol: str, market_data: Dict) -> Dict:
+    def analyze_signal(self, symbol: str, market_data: Dict) -> Dict:
         """信号分析"""
         try:
-            df = market_data['ohlcv']
+            ohlcv = market_data['ohlcv']
             ticker = market_data['ticker']
             
-            if df is None or len(df) < 50:
+            if ticker is None or ohlcv['close'].size < 50:
                 return None
             
-            close_prices = df['close']
-            
-            # RSI计算 - 使用配置文件参数
-            delta = close_prices.diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=RSI_PERIOD).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=RSI_PERIOD).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
-            current_rsi = rsi.iloc[-1]
-            
-            # 移动平均线 - 使用配置文件参数
-            ma_fast = close_prices.rolling(window=MA_SHORT).mean().iloc[-1]
-            ma_slow = close_prices.rolling(window=MA_LONG).mean().iloc[-1]
-            
-            # 价格变化
-            price_change = (ticker['last'] - close_prices.iloc[-2]) / close_prices.iloc[-2] * 100
-            
-            # 信号逻辑
-            signals = []
-            confidence = 0
-            
-            # RSI信号 - 使用配置文件参数
-            if current_rsi < RSI_OVERSOLD:
-                signals.append('LONG')
-                confidence += 0.4
-            elif current_rsi > RSI_OVERBOUGHT:
-                signals.append('SHORT')
-                confidence += 0.4
-            
-            # 均线信号
-            if ma_fast > ma_slow:
-                signals.append('LONG')
-                confidence += 0.3
-            else:
-                signals.append('SHORT')
-                confidence += 0.3
-            
-            # 价格突破信号
-            if abs(price_change) > 2:
-                if price_change > 0:
-                    signals.append('LONG')
-                else:
-                    signals.append('SHORT')
-                confidence += 0.4
+            # 最新K线和最新价都与上次相同（交易清淡的合约），结果不会变化，直接跳过
+            key = (int(ohlcv['ts'][-1]), ticker['last'])
+            if self._last_seen.get(symbol) == key:
+                return None
+            self._last_seen[symbol] = key
             
-            # 成交量确认 - 使用配置文件参数
-            if 'volume' in df.columns and len(df) >= VOLUME_SMA_PERIOD:
-                volume_ma = df['volume'].rolling(window=VOLUME_SMA_PERIOD).mean().iloc[-1]
-                current_volume = df['volume'].iloc[-1]
-                if current_volume > volume_ma * VOLUME_THRESHOLD:
-                    confidence += 0.2
+            # 只取计算所需的尾部（切片为视图，不复制），缩小指标计算遍历的数据量
+            timestamps = ohlcv['ts'][-INDICATOR_TAIL:]
+            close_prices = ohlcv['close'][-INDICATOR_TAIL:]
+            volumes = ohlcv['volume'][-INDICATOR_TAIL:]
             
-            # 判断信号方向
-            if len(signals) >= 2 and confidence >= 0.5:
-                long_count = signals.count('LONG')
-                short_count = signals.count('SHORT')
-                
-                if long_count > short_count:
-                    direction = 'LONG'
-                elif short_count > long_count:
-                    direction = 'SHORT'
-                else:
-                    return None
-                
-                return {
-                    'direction': direction,
-                    'confidence': confidence,
-                    'rsi': current_rsi,
-                    'price_change': price_change,
-                    'entry_price': ticker['last']
-                }
-            
-            return None
+            # RSI(Wilder)、均线、成交量均线 - 已收盘部分增量推进，最新一根叠加计算
+            state = self._closed_indicator_state(symbol, timestamps, close_prices, volumes)
+            indicators = rsi_ma_values(
+                state, close_prices, volumes,
+                RSI_PERIOD, MA_SHORT, MA_LONG, VOLUME_SMA_PERIOD
+            )
+            return self._vote_signal(*indicators, ticker)
             
         except Exception as e:
-            self.logger.debug(f"分析 {symbol} 信号失败: {e}")
+            self.logger.debug("分析 %s 信号失败: %s", symbol, e)
             return None
 
+    def _vote_signal(self, current_rsi: float, ma_fast: float, ma_slow: float, volume_ma: float,
+                     current_volume: float, prev_close: float, ticker: Dict) -> Dict:
+        """根据指标投票得出信号方向和置信度"""
+        # 价格变化
+        price_change = (ticker['last'] - prev_close) / prev_close * 100
+        
+        # 信号逻辑：多空票数与置信度累加
+        long_votes = 0
+        short_votes = 0
+        confidence = 0.0
+        
+        # RSI信号 - 使用配置文件参数
+        if current_rsi < RSI_OVERSOLD:
+            long_votes += 1
+            confidence += 0.4
+        elif current_rsi > RSI_OVERBOUGHT:
+            short_votes += 1
+            confidence += 0.4
+        
+        # 均线信号
+        if ma_fast > ma_slow:
+            long_votes += 1
+        else:
+            short_votes += 1
+        confidence += 0.3
+        
+        # 价格突破信号
+        if abs(price_change) > 2:
+            if price_change > 0:
+                long_votes += 1
+            else:
+                short_votes += 1
+            confidence += 0.4
+        
+        # 成交量确认 - 使用配置文件参数
+        if current_volume > volume_ma * VOLUME_THRESHOLD:
+            confidence += 0.2
+        
+        # 判断信号方向
+        if long_votes + short_votes >= 2 and confidence >= _MIN_CONFIDENCE and long_votes != short_votes:
+            return {
+                'direction': 'LONG' if long_votes > short_votes else 'SHORT',
+                'confidence': confidence,
+                'rsi': current_rsi,
+                'price_change': price_change,
+                'entry_price': ticker['last']
+            }
+        
+        return None
+
+    def _closed_indicator_state(self, symbol: str, timestamps: np.ndarray,
+                                close_prices: np.ndarray, volumes: np.ndarray) -> np.ndarray:
+        """
+        获取截至倒数第二根（已收盘）K线的RSI/均线状态
+        
+        与缓存相比只新收盘一根K线时O(1)推进，未变化时直接复用，其余情况从头计算。
+        """
+        closed_ts = timestamps[-2]
+        cached = self._indicator_state.get(symbol)
+        
+        if cached is not None and cached['last_ts'] == closed_ts:
+            return cached['state']
+        
+        if cached is not None and cached['last_ts'] == timestamps[-3]:
+            rsi_ma_step(cached['state'], close_prices, volumes, len(close_prices) - 2,
+                        RSI_PERIOD, MA_SHORT, MA_LONG, VOLUME_SMA_PERIOD)
+        else:
+            cached = {'state': np.zeros(RM_STATE_SIZE, dtype=np.float64)}
+            rsi_ma_seed(cached['state'], close_prices, volumes, len(close_prices) - 1,
+                        RSI_PERIOD, MA_SHORT, MA_LONG, VOLUME_SMA_PERIOD)
+            self._indicator_state[symbol] = cached
+        
+        cached['last_ts'] = closed_ts
+        return cached['state']
+
     async def handle_signal(self, symbol: str, signal: Dict, market_data: Dict):
         """处理信号"""
         try:
@@ -264,48 +383,32 @@ class SimpleOKXMonitor:
             # 发送到Telegram
             await self.send_telegram_signal(symbol, signal, market_data)
             
-            self.logger.info(f"发现信号: {symbol} {signal['direction']} (置信度: {signal['confidence']:.1%})")
+            self.logger.info("发现信号: %s %s (置信度: %.1f%%)", symbol, signal['direction'], signal['confidence'] * 100)
             
         except Exception as e:
-            self.logger.error(f"处理信号失败: {e}")
+            self.logger.error("处理信号失败: %s", e)
 
     async def send_telegram_signal(self, symbol: str, signal: Dict, market_data: Dict):
         """发送信号到Telegram"""
         try:
             ticker = market_data['ticker']
-            confidence = signal['confidence']
             
-            # 确定优先级
-            if confidence >= 0.8:
-                priority = 'EXTREME'
-                priority_desc = '极强信号'
-            elif confidence >= 0.65:
-                priority = 'HIGH'
-                priority_desc = '强信号'
-            elif confidence >= 0.5:
-                priority = 'MEDIUM'
-                priority_desc = '中信号'
-            else:
-                return  # 过滤低置信度信号
-            
-            # 生成交易链接
-            trading_url = self.data_fetcher.get_swap_trading_url(symbol)
+            # 确定优先级（低置信度信号已在分析阶段过滤）
+            priority, priority_desc = _priority_bucket(signal['confidence'])
             
             # 构建消息
-            direction_text = '做多' if signal['direction'] == 'LONG' else '做空'
-            message = f"""{priority_desc} - {symbol.replace('/USDT', '')}
-
-方向: {direction_text}
-价格: ${ticker['last']:.6f}
-置信度: {signal['confidence']:.1%}
-
-技术指标:
-• RSI: {signal['rsi']:.1f}
-• 价格变化: {signal['price_change']:.2f}%
-• 24H涨跌: {ticker['percentage']:.2f}%
-
-交易链接: {trading_url}
-时间: {datetime.now().strftime('%H:%M:%S')}"""
+            message = _MSG_TMPL.format(
+                priority_desc=priority_desc,
+                coin=_display_symbol(symbol),
+                direction_text=_DIRECTION_TEXT[signal['direction']],
+                price=ticker['last'],
+                confidence=signal['confidence'],
+                rsi=signal['rsi'],
+                price_change=signal['price_change'],
+                percentage=ticker['percentage'],
+                trading_url=self.data_fetcher.get_swap_trading_url(symbol),
+                time=datetime.now().strftime(_TIME_FMT)
+            )
             
             # 发送消息
             await self.telegram_bot.broadcast_signal(
@@ -316,15 +419,25 @@ class SimpleOKXMonitor:
             )
             
         except Exception as e:
-            self.logger.error(f"发送Telegram信号失败: {e}")
+            self.logger.error("发送Telegram信号失败: %s", e)
 
     async def stop(self):
         """停止系统"""
         self.logger.info("停止监控系统")
         self.running = False
         
-        if hasattr(self.telegram_bot, 'stop'):
-            await self.telegram_bot.stop()
+        await self.telegram_bot.stop()
+        
+        if self.streamer:
+            await self.streamer.stop()
+        
+        # 取消并等待所有后台任务结束，避免任务泄漏到事件循环关闭
+        for task in self._bg_tasks:
+            task.cancel()
+        await asyncio.gather(*self._bg_tasks, return_exceptions=True)
+        self._bg_tasks.clear()
+        
+        await self.data_fetcher.close()
 
 async def main():
     """主函数"""
@@ -333,7 +446,10 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if uvloop is not None:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         print("程序被用户中断")
     except Exception as e:
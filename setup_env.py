@@ -87,7 +87,7 @@ def check_requirements():
     
     # 检查关键依赖
     required_packages = [
-        'ccxt', 'telegram', 'pandas', 'numpy', 'aiohttp', 'requests'
+        'ccxt', 'telegram', 'pandas', 'numpy', 'aiohttp', 'aiolimiter', 'orjson'
     ]
     
     missing_packages = []
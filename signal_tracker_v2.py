@@ -1,447 +1,619 @@
-#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-"""
-改进版信号追踪器 v2.0
-- 多时间窗口验证（3min/5min/10min）
-- 更大的盈亏阈值（≥0.3%-0.5%）
-- 滚动胜率统计和盈亏比追踪
-- DRAW状态后续追踪
-"""
-
-import time
-import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, field
-from enum import Enum
-import pandas as pd
-import numpy as np
-
-class SignalStatus(Enum):
-    ACTIVE = "ACTIVE"
-    WIN = "WIN"
-    LOSS = "LOSS"
-    DRAW = "DRAW"
-    EXPIRED = "EXPIRED"
-
-@dataclass
-class ValidationWindow:
-    """验证时间窗口"""
-    duration_minutes: int
-    profit_threshold: float  # 盈利阈值
-    loss_threshold: float    # 亏损阈值
-    name: str
-
-@dataclass
-class SignalEvaluation:
-    """信号评估结果"""
-    symbol: str
-    entry_price: float
-    entry_time: datetime
-    current_price: float
-    current_time: datetime
-    
-    # 多窗口结果
-    window_results: Dict[str, str]  # 窗口名称 -> 结果状态
-    
-    # 统计信息
-    max_profit_pct: float = 0.0
-    max_loss_pct: float = 0.0
-    duration_minutes: float = 0.0
-    
-    # 最终状态
-    final_status: SignalStatus = SignalStatus.ACTIVE
-    final_profit_pct: float = 0.0
-
-@dataclass
-class PerformanceStats:
-    """性能统计"""
-    total_signals: int = 0
-    
-    # 按时间窗口分类
-    win_3min: int = 0
-    loss_3min: int = 0
-    draw_3min: int = 0
-    
-    win_5min: int = 0
-    loss_5min: int = 0
-    draw_5min: int = 0
-    
-    win_10min: int = 0
-    loss_10min: int = 0
-    draw_10min: int = 0
-    
-    # 综合统计
-    total_wins: int = 0
-    total_losses: int = 0
-    total_draws: int = 0
-    
-    # 收益统计
-    total_profit_pct: float = 0.0
-    avg_win_pct: float = 0.0
-    avg_loss_pct: float = 0.0
-    
-    # 高级指标
-    profit_factor: float = 0.0  # 总盈利/总亏损
-    max_consecutive_wins: int = 0
-    max_consecutive_losses: int = 0
-    
-    def win_rate(self, window: str = "overall") -> float:
-        """计算胜率"""
-        if window == "3min":
-            total = self.win_3min + self.loss_3min + self.draw_3min
-            return self.win_3min / total if total > 0 else 0.0
-        elif window == "5min":
-            total = self.win_5min + self.loss_5min + self.draw_5min
-            return self.win_5min / total if total > 0 else 0.0
-        elif window == "10min":
-            total = self.win_10min + self.loss_10min + self.draw_10min
-            return self.win_10min / total if total > 0 else 0.0
-        else:  # overall
-            total = self.total_wins + self.total_losses + self.total_draws
-            return self.total_wins / total if total > 0 else 0.0
-
-class ImprovedSignalTracker:
-    """改进版信号追踪器"""
-    
-    def __init__(self):
-        self.logger = logging.getLogger(__name__)
-        
-        # 验证窗口配置
-        self.validation_windows = [
-            ValidationWindow(3, 0.3, -0.3, "3min"),   # 3分钟，±0.3%
-            ValidationWindow(5, 0.4, -0.4, "5min"),   # 5分钟，±0.4%
-            ValidationWindow(10, 0.5, -0.5, "10min")  # 10分钟，±0.5%
-        ]
-        
-        # 活跃信号存储
-        self.active_signals: Dict[str, Dict] = {}  # signal_id -> signal_data
-        
-        # 历史记录
-        self.signal_history: List[SignalEvaluation] = []
-        
-        # 性能统计
-        self.performance_stats = PerformanceStats()
-        
-        # 连续胜负追踪
-        self.consecutive_wins = 0
-        self.consecutive_losses = 0
-        
-        self.logger.info("ImprovedSignalTracker 初始化完成")
-
-    def add_signal(self, symbol: str, direction: str, entry_price: float, 
-                   confidence: float, signal_data: Dict) -> str:
-        """添加新信号进行追踪"""
-        
-        signal_id = f"{symbol}_{direction}_{int(time.time())}"
-        entry_time = datetime.now()
-        
-        signal_info = {
-            'id': signal_id,
-            'symbol': symbol,
-            'direction': direction,
-            'entry_price': entry_price,
-            'entry_time': entry_time,
-            'confidence': confidence,
-            'signal_data': signal_data,
-            
-            # 追踪数据
-            'max_profit_pct': 0.0,
-            'max_loss_pct': 0.0,
-            'window_results': {},
-            'status': SignalStatus.ACTIVE,
-            
-            # 价格更新历史
-            'price_history': [(entry_time, entry_price)]
-        }
-        
-        # 初始化窗口结果
-        for window in self.validation_windows:
-            signal_info['window_results'][window.name] = SignalStatus.ACTIVE.value
-        
-        self.active_signals[signal_id] = signal_info
-        self.performance_stats.total_signals += 1
-        
-        self.logger.info(f"新增信号追踪: {signal_id} - {symbol} {direction} @{entry_price}")
-        return signal_id
-
-    def update_prices(self, current_prices: Dict[str, float]) -> List[SignalEvaluation]:
-        """更新价格并评估信号状态"""
-        current_time = datetime.now()
-        evaluations = []
-        
-        signals_to_remove = []
-        
-        for signal_id, signal_info in self.active_signals.items():
-            symbol = signal_info['symbol']
-            
-            if symbol not in current_prices:
-                continue
-            
-            current_price = current_prices[symbol]
-            entry_price = signal_info['entry_price']
-            direction = signal_info['direction']
-            entry_time = signal_info['entry_time']
-            
-            # 计算收益率
-            if direction.upper() == "LONG":
-                profit_pct = (current_price - entry_price) / entry_price * 100
-            else:  # SHORT
-                profit_pct = (entry_price - current_price) / entry_price * 100
-            
-            # 更新最大盈利/亏损
-            signal_info['max_profit_pct'] = max(signal_info['max_profit_pct'], profit_pct)
-            signal_info['max_loss_pct'] = min(signal_info['max_loss_pct'], profit_pct)
-            
-            # 添加价格历史
-            signal_info['price_history'].append((current_time, current_price))
-            
-            # 计算持续时间
-            duration_minutes = (current_time - entry_time).total_seconds() / 60
-            
-            # 评估各个时间窗口
-            signal_completed = False
-            
-            for window in self.validation_windows:
-                window_name = window.name
-                
-                # 跳过已完成的窗口
-                if signal_info['window_results'][window_name] != SignalStatus.ACTIVE.value:
-                    continue
-                
-                # 检查时间是否到达
-                if duration_minutes >= window.duration_minutes:
-                    # 根据阈值判断结果
-                    if profit_pct >= window.profit_threshold:
-                        result = SignalStatus.WIN
-                    elif profit_pct <= window.loss_threshold:
-                        result = SignalStatus.LOSS
-                    else:
-                        result = SignalStatus.DRAW
-                    
-                    signal_info['window_results'][window_name] = result.value
-                    self._update_window_stats(window_name, result)
-                    
-                    self.logger.info(
-                        f"窗口完成 {signal_id} {window_name}: {result.value} "
-                        f"({profit_pct:.2f}%)"
-                    )
-                
-                # 提前触发盈亏阈值
-                elif profit_pct >= window.profit_threshold:
-                    signal_info['window_results'][window_name] = SignalStatus.WIN.value
-                    self._update_window_stats(window_name, SignalStatus.WIN)
-                    
-                elif profit_pct <= window.loss_threshold:
-                    signal_info['window_results'][window_name] = SignalStatus.LOSS.value
-                    self._update_window_stats(window_name, SignalStatus.LOSS)
-            
-            # 检查信号是否完全完成（所有窗口都有结果）
-            all_windows_complete = all(
-                result != SignalStatus.ACTIVE.value 
-                for result in signal_info['window_results'].values()
-            )
-            
-            # 或者超过最大时间限制（15分钟）
-            if duration_minutes > 15:
-                all_windows_complete = True
-                for window_name in signal_info['window_results']:
-                    if signal_info['window_results'][window_name] == SignalStatus.ACTIVE.value:
-                        signal_info['window_results'][window_name] = SignalStatus.EXPIRED.value
-            
-            if all_windows_complete:
-                # 确定最终状态（以最长时间窗口为准）
-                final_result = signal_info['window_results']['10min']
-                if final_result == SignalStatus.ACTIVE.value:
-                    final_result = SignalStatus.EXPIRED.value
-                
-                signal_info['status'] = final_result
-                
-                # 更新总体统计
-                self._update_overall_stats(final_result, profit_pct)
-                
-                # 创建评估结果
-                evaluation = SignalEvaluation(
-                    symbol=symbol,
-                    entry_price=entry_price,
-                    entry_time=entry_time,
-                    current_price=current_price,
-                    current_time=current_time,
-                    window_results=signal_info['window_results'].copy(),
-                    max_profit_pct=signal_info['max_profit_pct'],
-                    max_loss_pct=signal_info['max_loss_pct'],
-                    duration_minutes=duration_minutes,
-                    final_status=SignalStatus(final_result),
-                    final_profit_pct=profit_pct
-                )
-                
-                evaluations.append(evaluation)
-                self.signal_history.append(evaluation)
-                signals_to_remove.append(signal_id)
-                
-                self.logger.info(f"信号完成: {signal_id} - 最终结果: {final_result} ({profit_pct:.2f}%)")
-        
-        # 移除已完成的信号
-        for signal_id in signals_to_remove:
-            del self.active_signals[signal_id]
-        
-        return evaluations
-
-    def _update_window_stats(self, window_name: str, result: SignalStatus):
-        """更新窗口统计"""
-        if window_name == "3min":
-            if result == SignalStatus.WIN:
-                self.performance_stats.win_3min += 1
-            elif result == SignalStatus.LOSS:
-                self.performance_stats.loss_3min += 1
-            else:
-                self.performance_stats.draw_3min += 1
-                
-        elif window_name == "5min":
-            if result == SignalStatus.WIN:
-                self.performance_stats.win_5min += 1
-            elif result == SignalStatus.LOSS:
-                self.performance_stats.loss_5min += 1
-            else:
-                self.performance_stats.draw_5min += 1
-                
-        elif window_name == "10min":
-            if result == SignalStatus.WIN:
-                self.performance_stats.win_10min += 1
-            elif result == SignalStatus.LOSS:
-                self.performance_stats.loss_10min += 1
-            else:
-                self.performance_stats.draw_10min += 1
-
-    def _update_overall_stats(self, result: str, profit_pct: float):
-        """更新总体统计"""
-        if result == SignalStatus.WIN.value:
-            self.performance_stats.total_wins += 1
-            self.performance_stats.total_profit_pct += profit_pct
-            
-            # 更新平均盈利
-            if self.performance_stats.total_wins > 0:
-                total_win_profit = (self.performance_stats.avg_win_pct * (self.performance_stats.total_wins - 1) + profit_pct)
-                self.performance_stats.avg_win_pct = total_win_profit / self.performance_stats.total_wins
-            
-            # 连续胜负追踪
-            self.consecutive_wins += 1
-            self.consecutive_losses = 0
-            self.performance_stats.max_consecutive_wins = max(
-                self.performance_stats.max_consecutive_wins, 
-                self.consecutive_wins
-            )
-            
-        elif result == SignalStatus.LOSS.value:
-            self.performance_stats.total_losses += 1
-            self.performance_stats.total_profit_pct += profit_pct  # 负数
-            
-            # 更新平均亏损
-            if self.performance_stats.total_losses > 0:
-                total_loss_profit = (self.performance_stats.avg_loss_pct * (self.performance_stats.total_losses - 1) + profit_pct)
-                self.performance_stats.avg_loss_pct = total_loss_profit / self.performance_stats.total_losses
-            
-            # 连续胜负追踪
-            self.consecutive_losses += 1
-            self.consecutive_wins = 0
-            self.performance_stats.max_consecutive_losses = max(
-                self.performance_stats.max_consecutive_losses,
-                self.consecutive_losses
-            )
-            
-        else:  # DRAW or EXPIRED
-            self.performance_stats.total_draws += 1
-        
-        # 更新盈利因子
-        total_win_amount = self.performance_stats.avg_win_pct * self.performance_stats.total_wins
-        total_loss_amount = abs(self.performance_stats.avg_loss_pct * self.performance_stats.total_losses)
-        
-        if total_loss_amount > 0:
-            self.performance_stats.profit_factor = total_win_amount / total_loss_amount
-        else:
-            self.performance_stats.profit_factor = float('inf') if total_win_amount > 0 else 0
-
-    def get_active_signals_count(self) -> int:
-        """获取活跃信号数量"""
-        return len(self.active_signals)
-
-    def get_performance_summary(self) -> Dict:
-        """获取性能总结"""
-        stats = self.performance_stats
-        
-        return {
-            "总信号数": stats.total_signals,
-            "活跃信号": len(self.active_signals),
-            
-            "3分钟窗口": {
-                "胜率": f"{stats.win_rate('3min'):.1%}",
-                "胜/负/平": f"{stats.win_3min}/{stats.loss_3min}/{stats.draw_3min}"
-            },
-            
-            "5分钟窗口": {
-                "胜率": f"{stats.win_rate('5min'):.1%}",
-                "胜/负/平": f"{stats.win_5min}/{stats.loss_5min}/{stats.draw_5min}"
-            },
-            
-            "10分钟窗口": {
-                "胜率": f"{stats.win_rate('10min'):.1%}",
-                "胜/负/平": f"{stats.win_10min}/{stats.loss_10min}/{stats.draw_10min}"
-            },
-            
-            "总体表现": {
-                "胜率": f"{stats.win_rate('overall'):.1%}",
-                "总收益": f"{stats.total_profit_pct:.2f}%",
-                "平均盈利": f"{stats.avg_win_pct:.2f}%",
-                "平均亏损": f"{stats.avg_loss_pct:.2f}%",
-                "盈利因子": f"{stats.profit_factor:.2f}",
-                "最大连胜": stats.max_consecutive_wins,
-                "最大连败": stats.max_consecutive_losses
-            }
-        }
-
-    def get_recent_signals(self, limit: int = 10) -> List[Dict]:
-        """获取最近的信号历史"""
-        recent = self.signal_history[-limit:] if len(self.signal_history) >= limit else self.signal_history
-        
-        results = []
-        for eval_result in recent:
-            results.append({
-                "符号": eval_result.symbol,
-                "入场时间": eval_result.entry_time.strftime("%H:%M:%S"),
-                "持续时间": f"{eval_result.duration_minutes:.1f}分钟",
-                "最终收益": f"{eval_result.final_profit_pct:.2f}%",
-                "最大盈利": f"{eval_result.max_profit_pct:.2f}%",
-                "最大亏损": f"{eval_result.max_loss_pct:.2f}%",
-                "最终状态": eval_result.final_status.value,
-                "窗口结果": eval_result.window_results
-            })
-        
-        return results
-
-    def format_performance_message(self) -> str:
-        """格式化性能消息"""
-        summary = self.get_performance_summary()
-        
-        msg = "📊 信号追踪性能报告\n"
-        msg += "=" * 30 + "\n\n"
-        
-        msg += f"📈 总体概况:\n"
-        msg += f"• 总信号数: {summary['总信号数']}\n"
-        msg += f"• 活跃信号: {summary['活跃信号']}\n"
-        msg += f"• 总体胜率: {summary['总体表现']['胜率']}\n"
-        msg += f"• 累计收益: {summary['总体表现']['总收益']}\n\n"
-        
-        msg += f"⏱️ 时间窗口表现:\n"
-        for window in ["3分钟窗口", "5分钟窗口", "10分钟窗口"]:
-            data = summary[window]
-            msg += f"• {window}: {data['胜率']} ({data['胜/负/平']})\n"
-        
-        msg += f"\n📊 详细指标:\n"
-        details = summary['总体表现']
-        msg += f"• 平均盈利: {details['平均盈利']}\n"
-        msg += f"• 平均亏损: {details['平均亏损']}\n"
-        msg += f"• 盈利因子: {details['盈利因子']}\n"
-        msg += f"• 最大连胜: {details['最大连胜']}\n"
-        msg += f"• 最大连败: {details['最大连败']}\n"
-        
-        return msg 
\ No newline at end of file
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+改进版信号追踪器 v2.0
+- 多时间窗口验证（3min/5min/10min）
+- 更大的盈亏阈值（≥0.3%-0.5%）
+- 滚动胜率统计和盈亏比追踪
+- DRAW状态后续追踪
+"""
+
+import time
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from enum import Enum
+import pandas as pd
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba为可选依赖，未安装时以纯Python执行同一个内核
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+class SignalStatus(Enum):
+    ACTIVE = "ACTIVE"
+    WIN = "WIN"
+    LOSS = "LOSS"
+    DRAW = "DRAW"
+    EXPIRED = "EXPIRED"
+
+# 状态码（int8），热路径只比较状态码，仅在生成评估结果时转换为 SignalStatus
+STATUS_ACTIVE, STATUS_WIN, STATUS_LOSS, STATUS_DRAW, STATUS_EXPIRED = range(5)
+_STATUS_BY_CODE = tuple(SignalStatus)  # 状态码 -> SignalStatus
+
+# 最长窗口状态码 -> 信号最终状态码（仍为ACTIVE的记为过期）
+FINAL_LUT = np.array([STATUS_EXPIRED, STATUS_WIN, STATUS_LOSS, STATUS_DRAW, STATUS_EXPIRED], dtype=np.int8)
+
+MAX_SIGNAL_MINUTES = 15  # 信号最长追踪时间（分钟），超时未完成的窗口记为过期
+
+
+@njit(cache=True, nogil=True)
+def _evaluate_batch(slots, cur_price, now_ns, entry_price, dir_sign, entry_ns, max_profit, max_loss,
+                    status, thr_profit, thr_loss, thr_dur, max_minutes):
+    """
+    评估一批活跃信号，原地更新最大盈亏和窗口状态码
+
+    每个窗口仍为ACTIVE时：触及盈利/亏损阈值判定胜/负，到期未触及判定平；
+    超过 max_minutes 仍未完成的窗口记为过期。
+
+    Args:
+        slots: 待评估信号的槽位
+        cur_price: 与 slots 对应的最新价格
+        now_ns: 当前时间（纳秒）
+        entry_price, dir_sign, entry_ns, max_profit, max_loss: 按槽位排列的信号数组
+        status: 槽位 × 窗口的状态码矩阵（int8）
+        thr_profit, thr_loss, thr_dur: 各窗口的盈利阈值、亏损阈值、时长（分钟）
+        max_minutes: 最长追踪时间（分钟）
+
+    Returns:
+        tuple: (收益率%, 持续分钟数, 本次判定的窗口掩码 N×窗口数, 是否全部窗口完成)
+    """
+    n = slots.shape[0]
+    n_windows = thr_profit.shape[0]
+    profit = np.empty(n, dtype=np.float64)
+    duration = np.empty(n, dtype=np.float64)
+    changed = np.zeros((n, n_windows), dtype=np.bool_)
+    completed = np.empty(n, dtype=np.bool_)
+    for i in range(n):
+        s = slots[i]
+        p = dir_sign[s] * (cur_price[i] - entry_price[s]) / entry_price[s] * 100.0
+        d = (now_ns - entry_ns[s]) / 6e10
+        profit[i] = p
+        duration[i] = d
+        if p > max_profit[s]:
+            max_profit[s] = p
+        if p < max_loss[s]:
+            max_loss[s] = p
+        done = True
+        for j in range(n_windows):
+            code = status[s, j]
+            if code == STATUS_ACTIVE:
+                if p >= thr_profit[j]:
+                    code = STATUS_WIN
+                elif p <= thr_loss[j]:
+                    code = STATUS_LOSS
+                elif d >= thr_dur[j]:
+                    code = STATUS_DRAW
+                if code != STATUS_ACTIVE:
+                    changed[i, j] = True
+                elif d > max_minutes:
+                    code = STATUS_EXPIRED
+                else:
+                    done = False
+                status[s, j] = code
+        completed[i] = done
+    return profit, duration, changed, completed
+
+
+@dataclass
+class ValidationWindow:
+    """验证时间窗口"""
+    duration_minutes: int
+    profit_threshold: float  # 盈利阈值
+    loss_threshold: float    # 亏损阈值
+    name: str
+
+@dataclass
+class SignalEvaluation:
+    """信号评估结果"""
+    symbol: str
+    entry_price: float
+    entry_time: datetime
+    current_price: float
+    current_time: datetime
+    
+    # 多窗口结果
+    window_results: Tuple[int, ...]  # 各窗口结果状态码，顺序与验证窗口一致
+    
+    # 统计信息
+    max_profit_pct: float = 0.0
+    max_loss_pct: float = 0.0
+    duration_minutes: float = 0.0
+    
+    # 最终状态
+    final_status: SignalStatus = SignalStatus.ACTIVE
+    final_profit_pct: float = 0.0
+
+WINDOW_NAMES = ("3min", "5min", "10min")  # 与 ImprovedSignalTracker.validation_windows 顺序一致
+
+HISTORY_MAXLEN = 10_000  # 信号历史保留的最大条数，更早的记录自动淘汰
+
+# 信号历史的列式记录：交易对按字典编码为int32，时间为Unix时间戳（秒），状态为状态码，
+# 价格保持float64，百分比和持续时间用float32（累计统计仍在 PerformanceStats 中以float64求和）
+HISTORY_DTYPE = np.dtype([
+    ('symbol', np.int32),
+    ('entry_price', np.float64),
+    ('entry_ts', np.float64),
+    ('current_price', np.float64),
+    ('current_ts', np.float64),
+    ('max_profit_pct', np.float32),
+    ('max_loss_pct', np.float32),
+    ('duration_minutes', np.float32),
+    ('final_status', np.int8),
+    ('final_profit_pct', np.float32),
+    ('window_results', np.int8, (len(WINDOW_NAMES),)),
+])
+
+@dataclass
+class PerformanceStats:
+    """性能统计"""
+    total_signals: int = 0
+    
+    # 按时间窗口分类：窗口 × 状态码 的计数矩阵，按批次用 np.bincount 累加
+    window_counts: np.ndarray = field(
+        default_factory=lambda: np.zeros((len(WINDOW_NAMES), len(SignalStatus)), dtype=np.int64)
+    )
+    
+    # 综合统计
+    total_wins: int = 0
+    total_losses: int = 0
+    total_draws: int = 0
+    
+    # 收益统计（累计和，均值与盈利因子由累计和直接导出）
+    total_profit_pct: float = 0.0
+    sum_win_pct: float = 0.0
+    sum_loss_pct: float = 0.0  # 负数
+    
+    # 高级指标
+    max_consecutive_wins: int = 0
+    max_consecutive_losses: int = 0
+    
+    win_3min = property(lambda self: int(self.window_counts[0, STATUS_WIN]))
+    loss_3min = property(lambda self: int(self.window_counts[0, STATUS_LOSS]))
+    draw_3min = property(lambda self: int(self.window_counts[0, STATUS_DRAW]))
+    
+    win_5min = property(lambda self: int(self.window_counts[1, STATUS_WIN]))
+    loss_5min = property(lambda self: int(self.window_counts[1, STATUS_LOSS]))
+    draw_5min = property(lambda self: int(self.window_counts[1, STATUS_DRAW]))
+    
+    win_10min = property(lambda self: int(self.window_counts[2, STATUS_WIN]))
+    loss_10min = property(lambda self: int(self.window_counts[2, STATUS_LOSS]))
+    draw_10min = property(lambda self: int(self.window_counts[2, STATUS_DRAW]))
+    
+    @property
+    def avg_win_pct(self) -> float:
+        """平均盈利"""
+        return self.sum_win_pct / self.total_wins if self.total_wins else 0.0
+    
+    @property
+    def avg_loss_pct(self) -> float:
+        """平均亏损"""
+        return self.sum_loss_pct / self.total_losses if self.total_losses else 0.0
+    
+    @property
+    def profit_factor(self) -> float:
+        """盈利因子：总盈利/总亏损"""
+        if self.sum_loss_pct < 0:
+            return self.sum_win_pct / -self.sum_loss_pct
+        return float('inf') if self.sum_win_pct > 0 else 0
+    
+    def win_rate(self, window: str = "overall") -> float:
+        """计算胜率"""
+        if window in WINDOW_NAMES:
+            counts = self.window_counts[WINDOW_NAMES.index(window)]
+            total = counts[STATUS_WIN] + counts[STATUS_LOSS] + counts[STATUS_DRAW]
+            return counts[STATUS_WIN] / total if total > 0 else 0.0
+        else:  # overall
+            total = self.total_wins + self.total_losses + self.total_draws
+            return self.total_wins / total if total > 0 else 0.0
+
+class ImprovedSignalTracker:
+    """改进版信号追踪器"""
+    
+    # 性能报告模板
+    _SUMMARY_TEMPLATE = (
+        "📊 信号追踪性能报告\n"
+        + "=" * 30 + "\n\n"
+        "📈 总体概况:\n"
+        "• 总信号数: {total_signals}\n"
+        "• 活跃信号: {active_signals}\n"
+        "• 总体胜率: {win_rate}\n"
+        "• 累计收益: {total_profit}\n\n"
+        "⏱️ 时间窗口表现:\n"
+        "• 3分钟窗口: {win_rate_3} ({wld_3})\n"
+        "• 5分钟窗口: {win_rate_5} ({wld_5})\n"
+        "• 10分钟窗口: {win_rate_10} ({wld_10})\n"
+        "\n📊 详细指标:\n"
+        "• 平均盈利: {avg_win}\n"
+        "• 平均亏损: {avg_loss}\n"
+        "• 盈利因子: {profit_factor}\n"
+        "• 最大连胜: {max_wins}\n"
+        "• 最大连败: {max_losses}\n"
+    )
+    
+    def __init__(self, capacity: int = 256):
+        self.logger = logging.getLogger(__name__)
+        
+        # 验证窗口配置
+        self.validation_windows = [
+            ValidationWindow(3, 0.3, -0.3, "3min"),   # 3分钟，±0.3%
+            ValidationWindow(5, 0.4, -0.4, "5min"),   # 5分钟，±0.4%
+            ValidationWindow(10, 0.5, -0.5, "10min")  # 10分钟，±0.5%
+        ]
+        
+        # 各窗口阈值和名称（按窗口顺序预先展开，热路径不再访问 ValidationWindow 属性）
+        self._thr_profit = np.array([w.profit_threshold for w in self.validation_windows], dtype=np.float64)
+        self._thr_loss = np.array([w.loss_threshold for w in self.validation_windows], dtype=np.float64)
+        self._thr_dur = np.array([w.duration_minutes for w in self.validation_windows], dtype=np.float64)
+        self._window_names = tuple(w.name for w in self.validation_windows)
+        
+        # 活跃信号存储：按槽位组织的并列数组（SoA），价格更新时整体向量化计算
+        self._capacity = capacity
+        self._entry_price = np.zeros(capacity, dtype=np.float64)  # 入场价保持全精度，收益率按float64计算
+        self._direction_sign = np.zeros(capacity, dtype=np.int8)  # 做多 +1，做空 -1
+        self._entry_ns = np.zeros(capacity, dtype=np.int64)  # 入场时间（单调时钟纳秒，只用于计算持续时间）
+        self._max_profit_pct = np.zeros(capacity, dtype=np.float32)  # 百分比级数值用float32足够，减半内存带宽
+        self._max_loss_pct = np.zeros(capacity, dtype=np.float32)
+        self._window_status = np.zeros((capacity, len(self.validation_windows)), dtype=np.int8)  # 槽位 × 窗口的状态码
+        self._symbols = np.empty(capacity, dtype=object)
+        self._signal_info: List[Optional[Dict]] = [None] * capacity  # 槽位 -> 信号ID、方向等非数值信息
+        self._free_slots: List[int] = list(range(capacity))  # 空闲槽位最小堆：优先复用低位槽位，活跃信号集中在数组前部
+        self.symbol_index: Dict[str, List[int]] = {}  # 交易对 -> 活跃信号槽位
+        
+        # 历史记录（列式存储，按写入游标追加，容量不足时翻倍，最多保留 HISTORY_MAXLEN 条）
+        self._history = np.zeros(capacity, dtype=HISTORY_DTYPE)
+        self._history_len = 0
+        self._symbol_codes: Dict[str, int] = {}  # 交易对 -> 字典编码
+        self._symbol_names: List[str] = []  # 字典编码 -> 交易对
+        
+        # 性能统计
+        self.performance_stats = PerformanceStats()
+        
+        # 连续胜负追踪
+        self.consecutive_wins = 0
+        self.consecutive_losses = 0
+        
+        self.logger.info("ImprovedSignalTracker 初始化完成")
+
+    def _grow(self):
+        """槽位用尽时容量翻倍"""
+        old = self._capacity
+        new = old * 2
+        for name in ('_entry_price', '_direction_sign', '_entry_ns', '_max_profit_pct',
+                     '_max_loss_pct', '_window_status', '_symbols'):
+            arr = getattr(self, name)
+            grown = np.zeros((new,) + arr.shape[1:], dtype=arr.dtype)
+            grown[:old] = arr
+            setattr(self, name, grown)
+        self._signal_info.extend([None] * old)
+        self._free_slots.extend(range(old, new))  # 新槽位都大于已有槽位，追加后仍是合法的堆
+        self._capacity = new
+
+    def add_signal(self, symbol: str, direction: str, entry_price: float, 
+                   confidence: float, signal_data: Dict) -> str:
+        """添加新信号进行追踪"""
+        
+        signal_id = f"{symbol}_{direction}_{int(time.time())}"
+        entry_time = datetime.now()
+        
+        if not self._free_slots:
+            self._grow()
+        slot = heapq.heappop(self._free_slots)
+        
+        self._entry_price[slot] = entry_price
+        self._direction_sign[slot] = 1 if direction.upper() == "LONG" else -1
+        self._entry_ns[slot] = time.monotonic_ns()
+        self._max_profit_pct[slot] = 0.0
+        self._max_loss_pct[slot] = 0.0
+        self._window_status[slot] = STATUS_ACTIVE
+        self._symbols[slot] = symbol
+        self._signal_info[slot] = {
+            'id': signal_id,
+            'direction': direction,
+            'entry_time': entry_time,  # 墙上时间，用于展示
+            'confidence': confidence,
+            'signal_data': signal_data
+        }
+        self.symbol_index.setdefault(symbol, []).append(slot)
+        self.performance_stats.total_signals += 1
+        
+        self.logger.info("新增信号追踪: %s - %s %s @%s", signal_id, symbol, direction, entry_price)
+        return signal_id
+
+    def _release(self, slot: int):
+        """释放已完成信号的槽位"""
+        symbol = self._symbols[slot]
+        slots = self.symbol_index[symbol]
+        slots.remove(slot)
+        if not slots:
+            del self.symbol_index[symbol]
+        self._symbols[slot] = None
+        self._signal_info[slot] = None
+        heapq.heappush(self._free_slots, slot)
+
+    def update_prices(self, current_prices: Dict[str, float]) -> List[SignalEvaluation]:
+        """更新价格并评估信号状态（所有活跃信号一次性批量计算）"""
+        now_ns = time.monotonic_ns()
+        evaluations = []
+        
+        symbol_index = self.symbol_index
+        if not symbol_index:
+            return evaluations
+        
+        # 按交易对索引收集有报价的活跃信号槽位及对应价格，没有报价的信号本轮不参与计算；
+        # 遍历活跃交易对与报价中较小的一侧，两者不相交时直接返回
+        slot_groups = []
+        group_prices = []
+        symbols = symbol_index if len(symbol_index) < len(current_prices) else current_prices
+        for symbol in symbols:
+            symbol_slots = symbol_index.get(symbol)
+            price = current_prices.get(symbol)
+            if symbol_slots and price is not None:
+                slot_groups.append(symbol_slots)
+                group_prices.append(price)
+        if not slot_groups:
+            return evaluations
+        
+        slots = np.concatenate(slot_groups).astype(np.int64, copy=False)
+        prices = np.repeat(np.asarray(group_prices, dtype=np.float64), [len(g) for g in slot_groups])
+        
+        # 计算收益率、更新最大盈亏并评估所有时间窗口（JIT内核，原地更新槽位数组）
+        profit_pct, duration_minutes, changed, completed = _evaluate_batch(
+            slots, prices, now_ns, self._entry_price, self._direction_sign, self._entry_ns,
+            self._max_profit_pct, self._max_loss_pct, self._window_status,
+            self._thr_profit, self._thr_loss, self._thr_dur, MAX_SIGNAL_MINUTES
+        )
+        current = self._window_status[slots]
+        
+        # 窗口统计：本批所有状态变化按 (窗口, 状态码) 一次计数
+        rows, cols = np.nonzero(changed)
+        if rows.size:
+            n_codes = len(_STATUS_BY_CODE)
+            self.performance_stats.window_counts += np.bincount(
+                cols * n_codes + current[rows, cols], minlength=self.performance_stats.window_counts.size
+            ).reshape(self.performance_stats.window_counts.shape)
+        
+        info_on = self.logger.isEnabledFor(logging.INFO)  # 逐信号日志先判断再格式化
+        if info_on:
+            log = self.logger.info
+            window_names = self._window_names
+            thr_dur = self._thr_dur
+            for i, w in zip(rows.tolist(), cols.tolist()):
+                if duration_minutes[i] >= thr_dur[w]:
+                    log("窗口完成 %s %s: %s (%.2f%%)", self._signal_info[slots[i]]['id'], window_names[w],
+                        _STATUS_BY_CODE[current[i, w]].value, profit_pct[i])
+        
+        # 所有窗口都有结果的信号完成追踪
+        done = np.flatnonzero(completed)
+        done = done[np.argsort(self._entry_ns[slots[done]], kind='stable')]  # 按入场先后结算，保持连胜/连败统计顺序
+        if done.size == 0:
+            return evaluations
+        
+        # 确定最终状态（以最长时间窗口为准），整批更新总体统计
+        final_codes = FINAL_LUT[current[done, -1]]
+        self._update_overall_stats(final_codes, profit_pct[done])
+        
+        current_time = datetime.now()  # 墙上时间只用于评估结果展示
+        self._append_history(slots[done], prices[done], current_time, duration_minutes[done],
+                             final_codes, profit_pct[done])
+        
+        for i, final_code in zip(done.tolist(), final_codes.tolist()):
+            slot = int(slots[i])
+            signal_info = self._signal_info[slot]
+            final_status = _STATUS_BY_CODE[final_code]
+            final_profit = float(profit_pct[i])
+            
+            # 创建评估结果
+            evaluation = SignalEvaluation(
+                symbol=self._symbols[slot],
+                entry_price=float(self._entry_price[slot]),
+                entry_time=signal_info['entry_time'],
+                current_price=float(prices[i]),
+                current_time=current_time,
+                window_results=tuple(current[i].tolist()),
+                max_profit_pct=float(self._max_profit_pct[slot]),
+                max_loss_pct=float(self._max_loss_pct[slot]),
+                duration_minutes=float(duration_minutes[i]),
+                final_status=final_status,
+                final_profit_pct=final_profit
+            )
+            
+            evaluations.append(evaluation)
+            
+            if info_on:
+                log("信号完成: %s - 最终结果: %s (%.2f%%)", signal_info['id'], final_status.value, final_profit)
+            
+            # 移除已完成的信号
+            self._release(slot)
+        
+        return evaluations
+
+    def _symbol_code(self, symbol: str) -> int:
+        """交易对的字典编码，首次出现时分配"""
+        code = self._symbol_codes.get(symbol)
+        if code is None:
+            code = self._symbol_codes[symbol] = len(self._symbol_names)
+            self._symbol_names.append(symbol)
+        return code
+
+    def _append_history(self, slots: np.ndarray, prices: np.ndarray, current_time: datetime,
+                        duration_minutes: np.ndarray, final_codes: np.ndarray, profit_pct: np.ndarray):
+        """把本批完成的信号整批写入历史记录"""
+        n = slots.size
+        start = self._history_len
+        if start + n > self._history.size:
+            # 缓冲区最多扩到 2×HISTORY_MAXLEN；写满后只把最近 HISTORY_MAXLEN 条移到开头，
+            # 淘汰旧记录的搬移开销均摊到每条追加上为O(1)
+            keep = min(start, HISTORY_MAXLEN)
+            size = max(min(self._history.size * 2, 2 * HISTORY_MAXLEN), keep + n)
+            buffer = self._history if size == self._history.size else np.zeros(size, dtype=HISTORY_DTYPE)
+            buffer[:keep] = self._history[start - keep:start]
+            self._history = buffer
+            start = keep
+        
+        rows = self._history[start:start + n]
+        rows['symbol'] = [self._symbol_code(symbol) for symbol in self._symbols[slots]]
+        rows['entry_price'] = self._entry_price[slots]
+        rows['entry_ts'] = [self._signal_info[slot]['entry_time'].timestamp() for slot in slots.tolist()]
+        rows['current_price'] = prices
+        rows['current_ts'] = current_time.timestamp()
+        rows['max_profit_pct'] = self._max_profit_pct[slots]
+        rows['max_loss_pct'] = self._max_loss_pct[slots]
+        rows['duration_minutes'] = duration_minutes
+        rows['final_status'] = final_codes
+        rows['final_profit_pct'] = profit_pct
+        rows['window_results'] = self._window_status[slots]
+        self._history_len = start + n
+
+    def _history_evaluation(self, row) -> SignalEvaluation:
+        """由一条历史记录构造 SignalEvaluation"""
+        return SignalEvaluation(
+            symbol=self._symbol_names[row['symbol']],
+            entry_price=float(row['entry_price']),
+            entry_time=datetime.fromtimestamp(row['entry_ts']),
+            current_price=float(row['current_price']),
+            current_time=datetime.fromtimestamp(row['current_ts']),
+            window_results=tuple(row['window_results'].tolist()),
+            max_profit_pct=float(row['max_profit_pct']),
+            max_loss_pct=float(row['max_loss_pct']),
+            duration_minutes=float(row['duration_minutes']),
+            final_status=_STATUS_BY_CODE[row['final_status']],
+            final_profit_pct=float(row['final_profit_pct'])
+        )
+
+    def window_results_text(self, window_codes) -> Dict[str, str]:
+        """把各窗口状态码转换为 {窗口名称: 结果状态} 的展示形式"""
+        return {name: _STATUS_BY_CODE[code].value for name, code in zip(self._window_names, window_codes)}
+
+    @property
+    def signal_history(self) -> List[SignalEvaluation]:
+        """保留的历史评估结果（兼容旧接口，按需从列式记录构造）"""
+        end = self._history_len
+        return [self._history_evaluation(row) for row in self._history[max(0, end - HISTORY_MAXLEN):end]]
+
+    def _update_overall_stats(self, results: np.ndarray, profit_pct: np.ndarray):
+        """
+        按批更新总体统计
+        
+        Args:
+            results: 本批完成信号的最终状态码（按入场先后排列）
+            profit_pct: 对应的最终收益率
+        """
+        stats = self.performance_stats
+        wins = results == STATUS_WIN
+        losses = results == STATUS_LOSS
+        n_wins = int(wins.sum())
+        n_losses = int(losses.sum())
+        
+        if n_wins:
+            win_sum = float(profit_pct[wins].sum())
+            stats.total_wins += n_wins
+            stats.sum_win_pct += win_sum
+            stats.total_profit_pct += win_sum
+        
+        if n_losses:
+            loss_sum = float(profit_pct[losses].sum())  # 负数
+            stats.total_losses += n_losses
+            stats.sum_loss_pct += loss_sum
+            stats.total_profit_pct += loss_sum
+        
+        stats.total_draws += results.size - n_wins - n_losses  # DRAW or EXPIRED
+        
+        # 连续胜负追踪（依赖完成顺序，逐个处理）
+        for result in results.tolist():
+            if result == STATUS_WIN:
+                self.consecutive_wins += 1
+                self.consecutive_losses = 0
+                stats.max_consecutive_wins = max(stats.max_consecutive_wins, self.consecutive_wins)
+            elif result == STATUS_LOSS:
+                self.consecutive_losses += 1
+                self.consecutive_wins = 0
+                stats.max_consecutive_losses = max(stats.max_consecutive_losses, self.consecutive_losses)
+
+    def get_active_signals_count(self) -> int:
+        """获取活跃信号数量"""
+        return self._capacity - len(self._free_slots)
+
+    def get_performance_summary(self) -> Dict:
+        """获取性能总结"""
+        stats = self.performance_stats
+        
+        return {
+            "总信号数": stats.total_signals,
+            "活跃信号": self.get_active_signals_count(),
+            
+            "3分钟窗口": {
+                "胜率": f"{stats.win_rate('3min'):.1%}",
+                "胜/负/平": f"{stats.win_3min}/{stats.loss_3min}/{stats.draw_3min}"
+            },
+            
+            "5分钟窗口": {
+                "胜率": f"{stats.win_rate('5min'):.1%}",
+                "胜/负/平": f"{stats.win_5min}/{stats.loss_5min}/{stats.draw_5min}"
+            },
+            
+            "10分钟窗口": {
+                "胜率": f"{stats.win_rate('10min'):.1%}",
+                "胜/负/平": f"{stats.win_10min}/{stats.loss_10min}/{stats.draw_10min}"
+            },
+            
+            "总体表现": {
+                "胜率": f"{stats.win_rate('overall'):.1%}",
+                "总收益": f"{stats.total_profit_pct:.2f}%",
+                "平均盈利": f"{stats.avg_win_pct:.2f}%",
+                "平均亏损": f"{stats.avg_loss_pct:.2f}%",
+                "盈利因子": f"{stats.profit_factor:.2f}",
+                "最大连胜": stats.max_consecutive_wins,
+                "最大连败": stats.max_consecutive_losses
+            }
+        }
+
+    def get_recent_signals(self, limit: int = 10) -> List[Dict]:
+        """获取最近的信号历史（直接切片列式记录，按列格式化）"""
+        recent = self._history[max(0, self._history_len - limit):self._history_len]
+        
+        results = []
+        for symbol, entry_ts, duration, final_profit, max_profit, max_loss, final_status, window_codes in zip(
+            recent['symbol'].tolist(), recent['entry_ts'].tolist(), recent['duration_minutes'].tolist(),
+            recent['final_profit_pct'].tolist(), recent['max_profit_pct'].tolist(),
+            recent['max_loss_pct'].tolist(), recent['final_status'].tolist(), recent['window_results'].tolist()
+        ):
+            results.append({
+                "符号": self._symbol_names[symbol],
+                "入场时间": datetime.fromtimestamp(entry_ts).strftime("%H:%M:%S"),
+                "持续时间": f"{duration:.1f}分钟",
+                "最终收益": f"{final_profit:.2f}%",
+                "最大盈利": f"{max_profit:.2f}%",
+                "最大亏损": f"{max_loss:.2f}%",
+                "最终状态": _STATUS_BY_CODE[final_status].value,
+                "窗口结果": self.window_results_text(window_codes)
+            })
+        
+        return results
+
+    def format_performance_message(self) -> str:
+        """格式化性能消息（固定模板，只代入数值）"""
+        stats = self.performance_stats
+        return self._SUMMARY_TEMPLATE.format_map({
+            'total_signals': stats.total_signals,
+            'active_signals': self.get_active_signals_count(),
+            'win_rate': f"{stats.win_rate('overall'):.1%}",
+            'total_profit': f"{stats.total_profit_pct:.2f}%",
+            'win_rate_3': f"{stats.win_rate('3min'):.1%}",
+            'wld_3': f"{stats.win_3min}/{stats.loss_3min}/{stats.draw_3min}",
+            'win_rate_5': f"{stats.win_rate('5min'):.1%}",
+            'wld_5': f"{stats.win_5min}/{stats.loss_5min}/{stats.draw_5min}",
+            'win_rate_10': f"{stats.win_rate('10min'):.1%}",
+            'wld_10': f"{stats.win_10min}/{stats.loss_10min}/{stats.draw_10min}",
+            'avg_win': f"{stats.avg_win_pct:.2f}%",
+            'avg_loss': f"{stats.avg_loss_pct:.2f}%",
+            'profit_factor': f"{stats.profit_factor:.2f}",
+            'max_wins': stats.max_consecutive_wins,
+            'max_losses': stats.max_consecutive_losses,
+        })
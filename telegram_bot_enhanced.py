@@ -1,49 +1,638 @@
 # 增强版Telegram机器人模块 - 支持内联按钮和自选关注
 import asyncio
+import html
 import logging
-import json
-import hashlib
+import os
+import re
 from datetime import datetime, timedelta
-from typing import Dict, List, Set
-import pandas as pd
+from typing import Dict, List, Optional, Set
+import numpy as np
 import time
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+import orjson
+from aiolimiter import AsyncLimiter
+from cachetools import TTLCache
 
 from telegram import Update, BotCommand, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (Application, CommandHandler, ContextTypes, 
                          CallbackQueryHandler, MessageHandler, filters)
 from telegram.constants import ParseMode
+from telegram.error import Forbidden, RetryAfter, TelegramError
 
-from config import (TELEGRAM_BOT_TOKEN, TRADING_PAIRS, CHANNELS, PERFORMANCE_CHANNEL,
+from config import (TELEGRAM_BOT_TOKEN, TELEGRAM_API_BASE_URL, TELEGRAM_API_BASE_FILE_URL, TELEGRAM_HTTP_VERSION, TRADING_PAIRS, CHANNELS, PERFORMANCE_CHANNEL,
                    RSI_PERIOD, RSI_OVERSOLD, RSI_OVERBOUGHT,
                    MA_SHORT, MA_LONG, BOLLINGER_PERIOD, BOLLINGER_STD,
                    EMA_FAST, EMA_SLOW, EMA_SIGNAL, VOLUME_SMA_PERIOD,
                    VOLUME_THRESHOLD, SUPPORT_RESISTANCE_PERIOD)
 from data_fetcher_okx import OKXDataFetcher
+from indicators import simple_rsi_ma
+
+BOT_STATE_FILE = os.path.join('.cache', 'bot_state.json')  # 订阅/自选/用户设置持久化文件
+BOT_STATE_SAVE_DELAY = 5  # 秒 - 状态变更后延迟合并写盘
+BOT_STATS_INTERVAL = 60  # 秒 - 广播/发送计数的汇总日志间隔
+SIGNAL_CACHE_MAXSIZE = 2048  # 信号详情缓存条数上限（超出按LRU淘汰）
+SIGNAL_CACHE_TTL = 3600  # 秒 - 信号详情按钮的有效期
+RECENT_SIGNAL_TTL = 300  # 秒 - 各交易对最近信号的保留时长
+ANALYSIS_CACHE_TTL = 60  # 秒 - 快速分析结果缓存时长（同一根K线、同一价格不重复计算）
+
+# 消息发送队列与Telegram限速：全局30条/秒，同一私聊1条/秒，同一频道/群组20条/分钟
+SEND_QUEUE_SIZE = 10_000
+SEND_WORKERS = 32  # 发送协程数，即同时进行中的 send_message 请求上限（网络往返期间其他协程继续发送）
+SEND_GLOBAL_RATE = (28, 1)  # 略低于Telegram全局30条/秒上限，留出余量避免429
+SEND_PRIVATE_RATE = (1, 1)
+SEND_GROUP_RATE = (20, 60)
+BOT_CONNECTION_POOL_SIZE = 256  # Bot API请求的HTTP连接池大小（显式固定，不依赖各版本默认值）
+BOT_POOL_TIMEOUT = 30  # 秒 - 等待空闲连接的超时（默认1秒，突发发送时易报连接池占满）
+
+# 各通知级别接收的信号优先级（ALL: 全部，MEDIUM: 中及以上，HIGH: 仅强信号）
+_LEVEL_ALLOWS = {
+    'ALL': frozenset({'EXTREME', 'HIGH', 'MEDIUM', 'LOW_ENHANCED'}),
+    'HIGH': frozenset({'EXTREME', 'HIGH'}),
+    'MEDIUM': frozenset({'EXTREME', 'HIGH', 'MEDIUM'}),
+}
+
+# 反查表：各信号优先级需要推送给哪些通知级别的用户
+_LEVELS_FOR_PRIORITY = {
+    priority: tuple(level for level, allowed in _LEVEL_ALLOWS.items() if priority in allowed)
+    for priority in _LEVEL_ALLOWS['ALL']
+}
+
+# 🎯 科学分级置信度系统配置（channel_attr 为推送频道对应的实例属性名）
+_PRIORITY_CONFIG = {
+    'EXTREME': {
+        'emoji': '🔥',
+        'title': '极强信号',
+        'description': '强烈关注，适合主力资金介入',
+        'channel_attr': 'main_channel',  # 高频频道
+        'urgent': True,
+        'confidence_range': '80-100%'
+    },
+    'HIGH': {
+        'emoji': '✅',
+        'title': '强信号',
+        'description': '可交易，但仍需看大盘与趋势',
+        'channel_attr': 'main_channel',  # 高频频道
+        'urgent': False,
+        'confidence_range': '65-80%'
+    },
+    'MEDIUM': {
+        'emoji': '⚠️',
+        'title': '中信号',
+        'description': '谨慎对待，仅适合小仓试探',
+        'channel_attr': 'detail_channel',  # 中频频道
+        'urgent': False,
+        'confidence_range': '50-65%'
+    },
+    'LOW_ENHANCED': {
+        'emoji': '🟡',
+        'title': '弱信号',
+        'description': '暂不建议直接交易，可观察',
+        'channel_attr': 'detail_channel',  # 中频频道
+        'urgent': False,
+        'confidence_range': '35-50%'
+    },
+    'NOISE': {
+        'emoji': '❌',
+        'title': '噪音信号',
+        'description': '回测中表现差，已过滤',
+        'channel_attr': None,  # 不推送到任何频道
+        'urgent': False,
+        'confidence_range': '0-35%'
+    }
+}
+
+_COIN_COMMAND_RE = re.compile(r'^/[a-zA-Z]{2,10}$')  # 币种快捷查询命令，如 /btc
+
+_TIME_FMT = '%H:%M:%S'  # 消息中的信号时间格式
+
+def _coin_grid(coins, per_row: int) -> str:
+    """把币种名排成每行 per_row 个的Markdown代码块列表"""
+    text = ""
+    for i, coin in enumerate(coins, 1):
+        text += f"`{coin}` "
+        if i % per_row == 0:
+            text += "\n"
+    return text
+
+@lru_cache(maxsize=512)
+def _signal_button_rows(symbol: str, urgent: bool) -> tuple:
+    """信号消息中与具体信号无关的按钮行：(详情按钮之前的行, 详情按钮之后的行)"""
+    coin = symbol.replace('/USDT', '')
+    head = ()
+    if urgent:
+        head = ((InlineKeyboardButton("⚡ 立即查看永续合约", url=f"https://www.okx.com/trade-swap/{symbol.replace('/USDT', '-usdt-swap').lower()}"),),)
+    tail = ((InlineKeyboardButton(f"📊 {coin} 分析", callback_data=f"analysis_{coin}"),),)
+    return head, tail
+
+def _signal_keyboard_rows(symbol: str, signal_id: str, urgent: bool) -> tuple:
+    """信号消息的完整按钮行"""
+    head, tail = _signal_button_rows(symbol, urgent)
+    return head + ((InlineKeyboardButton("🔍 查看详情", callback_data=f"details_{signal_id}"),),) + tail
+
+@lru_cache(maxsize=256)
+def _price_keyboard(coin: str) -> InlineKeyboardMarkup:
+    """/price 结果的按钮，按币种缓存"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("📊 技术分析", callback_data=f"analysis_{coin}")]
+    ])
+
+@lru_cache(maxsize=256)
+def _analysis_keyboard(coin: str) -> InlineKeyboardMarkup:
+    """实时分析结果的按钮，按币种缓存"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("📈 查看永续合约K线", url=f"https://www.okx.com/trade-swap/{coin.lower()}-usdt-swap")],
+        [InlineKeyboardButton("⭐ 添加关注", callback_data=f"watch_{coin}")],
+        [InlineKeyboardButton("🔄 刷新分析", callback_data=f"analysis_{coin}")]
+    ])
 
 class EnhancedTelegramBot:
+    # 静态消息文本（HTML）：帮助信息固定不变，欢迎语只替换用户名，频道介绍在初始化时渲染一次
+    _HELP_MESSAGE = """
+📚 <b>详细使用说明</b>
+
+🔔 <b>订阅管理</b>：
+/subscribe - 开始接收高质量信号推送
+/unsubscribe - 停止接收信号推送
+/status - 查看订阅状态和统计
+
+⭐ <b>自选关注</b>：
+/add BTC ETH SOL - 添加币种到关注列表
+/addall - 🔥 一键关注所有币种（77个）
+/remove BTC - 从关注列表移除币种
+/watchlist - 查看当前关注列表
+/clear - 清空关注列表
+
+🔍 <b>快速查询</b>：
+/btc - 查看BTC实时分析
+/eth - 查看ETH实时分析
+/price BTC - 查看BTC价格信息
+/币种符号 - 支持大部分主流币种
+
+📊 <b>信号说明</b>：
+🔥 <b>HIGH</b> - 70%+ 置信度，强烈推荐
+⚡ <b>MEDIUM</b> - 30%+ 置信度，谨慎参考
+🟢 <b>LONG</b> - 做多信号（买入）
+🔴 <b>SHORT</b> - 做空信号（卖出）
+
+🎛️ <b>高级功能</b>：
+• 点击信号消息中的"🔍 查看详情"按钮获取完整分析
+• 添加关注列表后只接收关注币种的信号
+• 支持设置信号质量过滤（仅高质量/全部）
+• 一键关注功能可快速监控所有77个币种
+
+⚠️ <b>风险提示</b>：
+本机器人仅提供技术分析信号，不构成投资建议。
+请结合自己的分析判断，谨慎投资，注意风险控制。
+        """
+    
+    _WELCOME_TEMPLATE = """
+🎯 <b>欢迎使用增强版加密货币交易信号机器人！</b>
+
+👋 欢迎，{username}！
+
+🚀 <b>核心功能</b>：
+• 📊 <b>智能信号</b>：基于多指标分析的高质量交易信号
+• 🔍 <b>内联查询</b>：点击按钮查看详细分析
+• ⭐ <b>自选关注</b>：添加感兴趣的币种到关注列表
+• 💬 <b>快速查询</b>：发送 /btc 快速查看BTC信号
+• 🔥 <b>一键关注</b>：支持一键关注所有77个币种
+
+📋 <b>快速开始</b>：
+/subscribe - 订阅交易信号
+/addall - 一键关注所有币种
+/btc - 查看BTC实时分析
+/help - 查看详细帮助
+
+🎯 <b>信号等级</b>：
+🔥 <b>高质量</b> - 70%+ 置信度，强推荐
+⚡ <b>中等质量</b> - 30%+ 置信度，参考用
+📊 <b>实时查询</b> - 随时查看技术分析
+
+💡 点击按钮开始使用 👇
+        """
+    
+    _CHANNELS_TEMPLATE = """
+📺 <b>官方频道配置</b>
+
+🔥 <b>主信号频道</b>：{main_channel}
+• 极强信号推送（80%+ 置信度）
+• 强信号推送（65%+ 置信度）
+• 适合主力资金介入的高质量信号
+
+⚠️ <b>副信号频道</b>：{detail_channel}  
+• 中信号推送（50%+ 置信度）
+• 增强弱信号推送（有突破迹象）
+• 谨慎对待，适合小仓试探
+
+💡 <b>信号分级说明</b>：
+🔥 极强信号 - 强烈推荐，适合主力资金
+✅ 强信号 - 可交易，需看大盘趋势  
+⚠️ 中信号 - 谨慎对待，小仓试探
+🟡 增强弱信号 - 有突破迹象，仅供观察
+
+📋 <b>使用建议</b>：
+• 新手：重点关注主频道的🔥极强信号
+• 专业：同时关注两个频道，灵活操作
+• 保守：只关注主频道的高质量信号
+
+💬 <b>私聊功能</b>：
+使用机器人私聊获得个性化服务和详细分析
+        """
+    
     def __init__(self):
         """初始化增强版Telegram机器人"""
         self.token = TELEGRAM_BOT_TOKEN
-        self.app = Application.builder().token(self.token).build()
+        self.app = (
+            Application.builder()
+            .token(self.token)
+            .base_url(TELEGRAM_API_BASE_URL)
+            .base_file_url(TELEGRAM_API_BASE_FILE_URL)
+            .connection_pool_size(BOT_CONNECTION_POOL_SIZE)
+            .pool_timeout(BOT_POOL_TIMEOUT)
+            .http_version(TELEGRAM_HTTP_VERSION)
+            .build()
+        )
         self.logger = logging.getLogger(__name__)
         
         # 用户管理
         self.subscribers = set()  # 订阅用户集合
         self.user_watchlists = {}  # 用户自选关注 {user_id: set(symbols)}
+        self.symbol_subscribers: Dict[str, Set[int]] = defaultdict(set)  # 反向索引 {symbol: set(user_id)}，与 user_watchlists 同步维护
         self.user_settings = {}   # 用户设置 {user_id: settings}
+        # 推送过滤索引，随订阅与设置变更同步维护，广播时按集合运算得到接收者
+        self._subs_by_level: Dict[str, Set[int]] = defaultdict(set)  # {通知级别: 订阅用户}
+        self._watchlist_only: Set[int] = set()  # 只接收关注币种信号的用户
         
         # 信号缓存
-        self.signal_cache = {}    # 信号详情缓存 {signal_id: signal_data}
-        self.recent_signals = {}  # 最近信号 {symbol: signal_data}
+        self.signal_cache = TTLCache(maxsize=SIGNAL_CACHE_MAXSIZE, ttl=SIGNAL_CACHE_TTL)  # 信号详情缓存 {signal_id: signal_data}
+        self.recent_signals = TTLCache(maxsize=len(TRADING_PAIRS) * 2, ttl=RECENT_SIGNAL_TTL)  # 最近信号 {symbol: signal_data}
+        self._analysis_cache = TTLCache(maxsize=1024, ttl=ANALYSIS_CACHE_TTL)  # 快速分析结果 {(symbol, 最新K线ts, 最新价): result}
         
         self.data_fetcher = OKXDataFetcher()
         
+        # 合约列表缓存（各命令共用，并发未命中时只请求一次）
+        self._contracts_cache = None
+        self._contracts_cache_ts = 0.0
+        self._contracts_set = frozenset()  # 合约集合，O(1)校验交易对
+        self._contracts_with_short = frozenset()  # 合约集合 + 简写（BTC/USDT 与 BTC）
+        self._contracts_coins = ()  # 去掉 /USDT 后缀的币种名，与合约列表同序
+        self._short_to_full: Dict[str, str] = {}  # 币种简写 -> 交易对，如 BTC -> BTC/USDT
+        self._full_to_short: Dict[str, str] = {}  # 交易对 -> 币种简写
+        # 由合约列表渲染好的固定文本片段，随缓存刷新重建
+        self._hot_coins_grid = ""       # /add 提示中的前20个币种
+        self._pairs_grid = ""           # /pairs 中的前30个币种
+        self._hot_coins_text = ""       # /addall 结果中的前15个币种
+        self._addall_preview = ""       # 一键关注按钮结果中的前10个币种
+        self._contracts_lock = asyncio.Lock()
+        
+        # 信号发送队列：广播只负责入队，由发送协程按限速推送
+        self.send_queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self._send_limiter = AsyncLimiter(*SEND_GLOBAL_RATE)
+        self._chat_limiters: Dict[object, AsyncLimiter] = {}  # 会话 -> 限速器，取消订阅或被屏蔽时移除
+        self._send_tasks: List[asyncio.Task] = []
+        # 广播与发送计数，由 _stats_flusher 定期汇总输出，热路径上不逐条写日志
+        self._stats: Counter = Counter()
+        self._stats_task: Optional[asyncio.Task] = None
+        
+        # 进行中的行情请求 {(方法, 参数...): Task}，相同请求并发时共享一次结果
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        
+        # 用户状态持久化（变更后延迟合并写盘，重启时恢复）
+        self._state_dirty = False
+        self._state_save_handle = None
+        self._load_state()
+        
         # 设置命令处理器
         self.setup_handlers()
         
         # 初始化频道配置 - 科学分级推送
         self.main_channel = '@btczyz_signals_2025'     # 主信号频道 - 极强/强信号
         self.detail_channel = '@ethzyz_signals_2025'   # 副频道 - 中信号/增强弱信号
+        self._channels_message = self._CHANNELS_TEMPLATE.format(
+            main_channel=self.main_channel, detail_channel=self.detail_channel
+        )
+        
+        self._build_keyboards()
+        
+    def _build_keyboards(self):
+        """预先构建固定内容的内联键盘（InlineKeyboardMarkup不可变，各处理器复用同一实例）"""
+        # /start 快速操作
+        self._start_keyboard = InlineKeyboardMarkup([
+            [
+                InlineKeyboardButton("🔔 订阅信号", callback_data="action_subscribe"),
+                InlineKeyboardButton("🔥 一键关注所有币种", callback_data="action_addall")
+            ],
+            [
+                InlineKeyboardButton("⭐ 管理关注", callback_data="action_watchlist"),
+                InlineKeyboardButton("📊 热门币种", callback_data="action_hot_coins")
+            ],
+            [
+                InlineKeyboardButton("❓ 获取帮助", callback_data="action_help")
+            ]
+        ])
+        # 已订阅时的设置入口
+        self._subscribed_keyboard = InlineKeyboardMarkup([
+            [InlineKeyboardButton("⚙️ 设置", callback_data="action_settings")],
+            [InlineKeyboardButton("⭐ 管理关注", callback_data="action_watchlist")]
+        ])
+        # 订阅成功
+        self._subscribe_done_keyboard = InlineKeyboardMarkup([
+            [InlineKeyboardButton("⭐ 添加关注币种", callback_data="action_add_coins")],
+            [InlineKeyboardButton("🔥 查看热门信号", callback_data="action_hot_signals")]
+        ])
+        # /add 结果
+        self._add_result_keyboard = InlineKeyboardMarkup([
+            [InlineKeyboardButton("📋 查看关注列表", callback_data="action_show_watchlist")],
+            [InlineKeyboardButton("🔔 信号设置", callback_data="action_settings")]
+        ])
+        # 关注列表为空
+        self._watchlist_empty_keyboard = InlineKeyboardMarkup([
+            [InlineKeyboardButton("⭐ 添加关注币种", callback_data="action_add_coins")]
+        ])
+        # 关注列表管理
+        self._watchlist_keyboard = InlineKeyboardMarkup([
+            [InlineKeyboardButton("➕ 添加更多", callback_data="action_add_coins")],
+            [InlineKeyboardButton("🗑️ 清空列表", callback_data="action_clear_watchlist")]
+        ])
+        # 一键关注完成
+        self._addall_done_keyboard = InlineKeyboardMarkup([
+            [
+                InlineKeyboardButton("📋 查看列表", callback_data="action_show_watchlist"),
+                InlineKeyboardButton("⚙️ 信号设置", callback_data="action_settings")
+            ],
+            [
+                InlineKeyboardButton("🔥 热门币种", callback_data="action_hot_coins"),
+                InlineKeyboardButton("🗑️ 清空列表", callback_data="action_clear_watchlist")
+            ]
+        ])
+        # /status（按是否订阅二选一）
+        self._status_subscribed_keyboard = InlineKeyboardMarkup([
+            [InlineKeyboardButton("⚙️ 信号设置", callback_data="action_settings")],
+            [InlineKeyboardButton("⭐ 管理关注", callback_data="action_watchlist")]
+        ])
+        self._status_unsubscribed_keyboard = InlineKeyboardMarkup([
+            [InlineKeyboardButton("🔔 立即订阅", callback_data="action_subscribe")],
+            [InlineKeyboardButton("⭐ 管理关注", callback_data="action_watchlist")]
+        ])
+        
+    async def _get_contracts_cached(self, ttl=60):
+        """
+        获取合约列表，ttl 秒内直接返回内存缓存
+        
+        Args:
+            ttl: 缓存有效期（秒）
+            
+        Returns:
+            list: 合约交易对列表
+        """
+        if self._contracts_cache and time.monotonic() - self._contracts_cache_ts < ttl:
+            return self._contracts_cache
+        async with self._contracts_lock:
+            # 等锁期间其他请求可能已刷新缓存
+            if self._contracts_cache and time.monotonic() - self._contracts_cache_ts < ttl:
+                return self._contracts_cache
+            contracts = await self.data_fetcher.fetch_all_contracts()
+            self._contracts_coins = tuple(symbol.replace('/USDT', '') for symbol in contracts)
+            self._short_to_full = dict(zip(self._contracts_coins, contracts))
+            self._full_to_short = dict(zip(contracts, self._contracts_coins))
+            self._hot_coins_grid = _coin_grid(self._contracts_coins[:20], 6)
+            self._pairs_grid = _coin_grid(self._contracts_coins[:30], 6)
+            self._hot_coins_text = ' '.join(self._contracts_coins[:15])
+            self._addall_preview = ', '.join(self._contracts_coins[:10])
+            self._contracts_set = frozenset(contracts)
+            self._contracts_with_short = self._contracts_set | frozenset(self._contracts_coins)
+            self._contracts_cache = contracts
+            self._contracts_cache_ts = time.monotonic()
+            return contracts
+        
+    def _chat_limiter(self, chat_id) -> AsyncLimiter:
+        """获取单个会话的限速器（私聊为正数ID，频道/群组为 @用户名 或负数ID）"""
+        limiter = self._chat_limiters.get(chat_id)
+        if limiter is None:
+            is_private = isinstance(chat_id, int) and chat_id > 0
+            limiter = AsyncLimiter(*(SEND_PRIVATE_RATE if is_private else SEND_GROUP_RATE))
+            self._chat_limiters[chat_id] = limiter
+        return limiter
+        
+    def _enqueue_message(self, chat_id, text: str, reply_markup=None) -> bool:
+        """
+        将一条HTML消息加入发送队列
+        
+        Returns:
+            bool: 队列已满时返回False（消息被丢弃）
+        """
+        try:
+            self.send_queue.put_nowait((chat_id, text, reply_markup))
+            return True
+        except asyncio.QueueFull:
+            # 队列满时一次广播可能连续丢弃大量消息，只计数，由 _log_stats 汇总告警
+            self._stats['dropped'] += 1
+            return False
+        
+    async def _send_worker(self):
+        """
+        从发送队列取消息，按全局与单会话限速发送；遇到429时按服务端要求等待后重发一次
+        
+        会话限速额度已用完的消息延后重新入队，发送协程不阻塞在单个会话上，
+        其他会话的消息照常发送。
+        """
+        while True:
+            chat_id, text, reply_markup = await self.send_queue.get()
+            try:
+                chat_limiter = self._chat_limiter(chat_id)
+                if not chat_limiter.has_capacity():
+                    # 约一个令牌恢复所需时间后再入队
+                    asyncio.get_running_loop().call_later(
+                        chat_limiter.time_period / chat_limiter.max_rate,
+                        self._enqueue_message, chat_id, text, reply_markup
+                    )
+                    continue
+                async with chat_limiter, self._send_limiter:
+                    for attempt in range(2):
+                        try:
+                            await self.app.bot.send_message(
+                                chat_id=chat_id,
+                                text=text,
+                                parse_mode=ParseMode.HTML,
+                                reply_markup=reply_markup
+                            )
+                            self._stats['sent'] += 1
+                            break
+                        except RetryAfter as e:
+                            if attempt:
+                                raise
+                            await asyncio.sleep(e.retry_after)
+            except Forbidden as e:
+                # 用户屏蔽或删除了机器人，不再向其推送
+                self._stats['failed'] += 1
+                self.logger.warning("发送给 %s 失败: %s", chat_id, e)
+                self._chat_limiters.pop(chat_id, None)
+                if chat_id in self.subscribers:
+                    self._unsubscribe(chat_id)
+            except TelegramError as e:
+                self._stats['failed'] += 1
+                self.logger.warning("发送给 %s 失败: %s", chat_id, e)
+            except Exception as e:
+                self._stats['failed'] += 1
+                # 非Telegram接口错误（如消息参数异常），按错误记录便于排查
+                self.logger.error("发送给 %s 时出现异常: %s", chat_id, e)
+            finally:
+                self.send_queue.task_done()
+                
+    def _log_stats(self):
+        """输出并清零自上次汇总以来的广播与发送计数"""
+        if not self._stats:
+            return
+        stats = self._stats
+        self._stats = Counter()
+        self.logger.info(
+            "信号推送统计: 广播 %d 条, 过滤NOISE %d 条, 频道入队 %d 条, 用户入队 %d 条, 发送成功 %d 条, 失败 %d 条, 队列积压 %d",
+            stats['signals'], stats['noise'], stats['channel'], stats['queued'],
+            stats['sent'], stats['failed'], self.send_queue.qsize()
+        )
+        if stats['dropped']:
+            self.logger.warning("发送队列已满，统计周期内丢弃 %d 条消息", stats['dropped'])
+        
+    async def _stats_flusher(self):
+        """每 BOT_STATS_INTERVAL 秒汇总输出一次推送统计"""
+        while True:
+            await asyncio.sleep(BOT_STATS_INTERVAL)
+            self._log_stats()
+        
+    async def _singleflight(self, key: tuple, factory):
+        """
+        合并相同的并发请求：首个调用方发起请求，其余调用方等待同一个任务
+        
+        Args:
+            key: 请求标识，如 ('ohlcv', symbol, timeframe, limit)
+            factory: 无参函数，返回实际发起请求的协程
+            
+        Returns:
+            请求结果
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield：单个调用方被取消时不影响其他等待者
+        return await asyncio.shield(task)
+        
+    def _load_state(self):
+        """从磁盘恢复订阅用户、自选关注与用户设置，文件缺失或损坏时从空状态开始"""
+        try:
+            with open(BOT_STATE_FILE, 'rb') as f:
+                state = orjson.loads(f.read())
+            for user_id, symbols in state.get('watchlists', {}).items():
+                self._watch(int(user_id), symbols)
+            for user_id, settings in state.get('settings', {}).items():
+                if 'created_at' in settings:
+                    settings['created_at'] = datetime.fromisoformat(settings['created_at'])
+                self._set_user_settings(int(user_id), settings)
+            for user_id in state.get('subscribers', ()):
+                self._subscribe(int(user_id))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            self.logger.warning("读取用户状态失败，使用空状态: %s", e)
+            return
+        self._state_dirty = False
+        self.logger.info("已恢复用户状态: %d 个订阅用户, %d 个自选列表", len(self.subscribers), len(self.user_watchlists))
+        
+    def _save_state(self):
+        """将用户状态写入磁盘（先写临时文件再替换，避免读到半截文件）"""
+        try:
+            os.makedirs(os.path.dirname(BOT_STATE_FILE), exist_ok=True)
+            tmp_file = BOT_STATE_FILE + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(orjson.dumps({
+                    'subscribers': sorted(self.subscribers),
+                    'watchlists': {user_id: sorted(symbols) for user_id, symbols in self.user_watchlists.items()},
+                    'settings': self.user_settings
+                }, option=orjson.OPT_NON_STR_KEYS))
+            os.replace(tmp_file, BOT_STATE_FILE)
+        except (OSError, TypeError) as e:
+            self.logger.warning("写入用户状态失败: %s", e)
+            
+    def _mark_dirty(self):
+        """标记用户状态已变更，BOT_STATE_SAVE_DELAY 秒内的多次变更合并为一次写盘"""
+        self._state_dirty = True
+        if self._state_save_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # 事件循环外（如启动时恢复状态）不安排写盘
+        self._state_save_handle = loop.call_later(BOT_STATE_SAVE_DELAY, self._flush_state)
+        
+    def _flush_state(self):
+        """有未落盘的变更时立即写盘"""
+        if self._state_save_handle is not None:
+            self._state_save_handle.cancel()
+            self._state_save_handle = None
+        if self._state_dirty:
+            self._state_dirty = False
+            self._save_state()
+        
+    def _subscribe(self, user_id: int):
+        """添加订阅用户并计入通知级别索引"""
+        self.subscribers.add(user_id)
+        level = self.user_settings.get(user_id, {}).get('notification_level', 'HIGH')
+        self._subs_by_level[level].add(user_id)
+        self._mark_dirty()
+        
+    def _unsubscribe(self, user_id: int):
+        """移除订阅用户并同步通知级别索引"""
+        self.subscribers.discard(user_id)
+        self._chat_limiters.pop(user_id, None)
+        for users in self._subs_by_level.values():
+            users.discard(user_id)
+        self._mark_dirty()
+        
+    def _set_user_settings(self, user_id: int, settings: dict):
+        """写入用户设置并同步推送过滤索引"""
+        self.user_settings[user_id] = settings
+        if user_id in self.subscribers:
+            for users in self._subs_by_level.values():
+                users.discard(user_id)
+            self._subs_by_level[settings.get('notification_level', 'HIGH')].add(user_id)
+        if settings.get('watchlist_only', False):
+            self._watchlist_only.add(user_id)
+        else:
+            self._watchlist_only.discard(user_id)
+        self._mark_dirty()
+        
+    def _short(self, symbol: str) -> str:
+        """交易对的币种简写（已不在合约列表中的交易对退回字符串替换）"""
+        return self._full_to_short.get(symbol) or symbol.replace('/USDT', '')
+        
+    def _watch(self, user_id: int, symbols) -> int:
+        """添加关注并同步反向索引，返回新增数量"""
+        watchlist = self.user_watchlists.setdefault(user_id, set())
+        original_count = len(watchlist)
+        watchlist.update(symbols)
+        for symbol in symbols:
+            self.symbol_subscribers[symbol].add(user_id)
+        added = len(watchlist) - original_count
+        if added:
+            self._mark_dirty()
+        return added
+        
+    def _unwatch(self, user_id: int, symbols):
+        """取消关注并同步反向索引"""
+        watchlist = self.user_watchlists.get(user_id)
+        if watchlist is None:
+            return
+        for symbol in list(symbols):
+            watchlist.discard(symbol)
+            users = self.symbol_subscribers.get(symbol)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self.symbol_subscribers[symbol]
+        self._mark_dirty()
         
     def setup_handlers(self):
         """设置命令处理器"""
@@ -66,7 +655,8 @@ class EnhancedTelegramBot:
             CommandHandler("addall", self.add_all_coins_command),  # 新增：一键关注所有币种
             
             # 币种查询（支持 /btc, /eth 等）
-            MessageHandler(filters.Regex(r'^/[a-zA-Z]{2,10}$'), self.coin_query_command),
+            # 先按消息实体判断是否为命令，普通文本不再跑正则
+            MessageHandler(filters.COMMAND & filters.Regex(_COIN_COMMAND_RE), self.coin_query_command),
             
             # 内联按钮回调
             CallbackQueryHandler(self.handle_callback_query),
@@ -86,110 +676,29 @@ class EnhancedTelegramBot:
         
         # 初始化用户设置
         if user_id not in self.user_settings:
-            self.user_settings[user_id] = {
+            self._set_user_settings(user_id, {
                 'notification_level': 'HIGH',  # HIGH, MEDIUM, ALL
                 'watchlist_only': False,
                 'created_at': datetime.now()
-            }
+            })
         
-        welcome_message = f"""
-🎯 **欢迎使用增强版加密货币交易信号机器人！**
-
-👋 欢迎，{username}！
-
-🚀 **核心功能**：
-• 📊 **智能信号**：基于多指标分析的高质量交易信号
-• 🔍 **内联查询**：点击按钮查看详细分析
-• ⭐ **自选关注**：添加感兴趣的币种到关注列表
-• 💬 **快速查询**：发送 /btc 快速查看BTC信号
-• 🔥 **一键关注**：支持一键关注所有77个币种
-
-📋 **快速开始**：
-/subscribe - 订阅交易信号
-/addall - 一键关注所有币种
-/btc - 查看BTC实时分析
-/help - 查看详细帮助
-
-🎯 **信号等级**：
-🔥 **高质量** - 70%+ 置信度，强推荐
-⚡ **中等质量** - 30%+ 置信度，参考用
-📊 **实时查询** - 随时查看技术分析
-
-💡 点击按钮开始使用 👇
-        """
-        
-        # 创建快速操作按钮
-        keyboard = [
-            [
-                InlineKeyboardButton("🔔 订阅信号", callback_data="action_subscribe"),
-                InlineKeyboardButton("🔥 一键关注所有币种", callback_data="action_addall")
-            ],
-            [
-                InlineKeyboardButton("⭐ 管理关注", callback_data="action_watchlist"),
-                InlineKeyboardButton("📊 热门币种", callback_data="action_hot_coins")
-            ],
-            [
-                InlineKeyboardButton("❓ 获取帮助", callback_data="action_help")
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        welcome_message = self._WELCOME_TEMPLATE.format(username=html.escape(username))
         
         await update.message.reply_text(
             welcome_message, 
-            parse_mode=ParseMode.MARKDOWN,
-            reply_markup=reply_markup
+            parse_mode=ParseMode.HTML,
+            reply_markup=self._start_keyboard
         )
         
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理/help命令"""
-        help_message = """
-📚 **详细使用说明**
-
-🔔 **订阅管理**：
-/subscribe - 开始接收高质量信号推送
-/unsubscribe - 停止接收信号推送
-/status - 查看订阅状态和统计
-
-⭐ **自选关注**：
-/add BTC ETH SOL - 添加币种到关注列表
-/addall - 🔥 一键关注所有币种（77个）
-/remove BTC - 从关注列表移除币种
-/watchlist - 查看当前关注列表
-/clear - 清空关注列表
-
-🔍 **快速查询**：
-/btc - 查看BTC实时分析
-/eth - 查看ETH实时分析
-/price BTC - 查看BTC价格信息
-/币种符号 - 支持大部分主流币种
-
-📊 **信号说明**：
-🔥 **HIGH** - 70%+ 置信度，强烈推荐
-⚡ **MEDIUM** - 30%+ 置信度，谨慎参考
-🟢 **LONG** - 做多信号（买入）
-🔴 **SHORT** - 做空信号（卖出）
-
-🎛️ **高级功能**：
-• 点击信号消息中的"🔍 查看详情"按钮获取完整分析
-• 添加关注列表后只接收关注币种的信号
-• 支持设置信号质量过滤（仅高质量/全部）
-• 一键关注功能可快速监控所有77个币种
-
-⚠️ **风险提示**：
-本机器人仅提供技术分析信号，不构成投资建议。
-请结合自己的分析判断，谨慎投资，注意风险控制。
-        """
-        await update.message.reply_text(help_message, parse_mode=ParseMode.MARKDOWN)
+        await update.message.reply_text(self._HELP_MESSAGE, parse_mode=ParseMode.HTML)
         
     async def subscribe_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理订阅命令"""
         user_id = update.effective_user.id
         if user_id in self.subscribers:
-            keyboard = [
-                [InlineKeyboardButton("⚙️ 设置", callback_data="action_settings")],
-                [InlineKeyboardButton("⭐ 管理关注", callback_data="action_watchlist")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            reply_markup = self._subscribed_keyboard
             
             await update.message.reply_text(
                 "✅ 您已经订阅了交易信号推送！\n\n"
@@ -197,13 +706,9 @@ class EnhancedTelegramBot:
                 reply_markup=reply_markup
             )
         else:
-            self.subscribers.add(user_id)
+            self._subscribe(user_id)
             
-            keyboard = [
-                [InlineKeyboardButton("⭐ 添加关注币种", callback_data="action_add_coins")],
-                [InlineKeyboardButton("🔥 查看热门信号", callback_data="action_hot_signals")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            reply_markup = self._subscribe_done_keyboard
             
             await update.message.reply_text(
                 "🎉 **订阅成功！**\n\n"
@@ -213,18 +718,18 @@ class EnhancedTelegramBot:
                 parse_mode=ParseMode.MARKDOWN,
                 reply_markup=reply_markup
             )
-            self.logger.info(f"用户 {user_id} 订阅了信号推送")
+            self.logger.info("用户 %s 订阅了信号推送", user_id)
             
     async def unsubscribe_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理取消订阅命令"""
         user_id = update.effective_user.id
         if user_id in self.subscribers:
-            self.subscribers.remove(user_id)
+            self._unsubscribe(user_id)
             await update.message.reply_text(
                 "❌ 已取消订阅交易信号推送。\n\n"
                 "💡 使用 /subscribe 可重新订阅。"
             )
-            self.logger.info(f"用户 {user_id} 取消了信号推送订阅")
+            self.logger.info("用户 %s 取消了信号推送订阅", user_id)
         else:
             await update.message.reply_text("⚠️ 您还没有订阅交易信号推送。")
             
@@ -234,17 +739,16 @@ class EnhancedTelegramBot:
         
         if not context.args:
             # 显示可选币种
-            all_contracts = await self.data_fetcher.fetch_all_contracts()
-            hot_coins = all_contracts[:20] if all_contracts else TRADING_PAIRS
+            all_contracts = await self._get_contracts_cached()
+            if all_contracts:
+                hot_coins_grid = self._hot_coins_grid
+            else:
+                hot_coins_grid = _coin_grid([symbol.replace('/USDT', '') for symbol in TRADING_PAIRS], 6)
             
             message = f"📝 **添加关注币种**\n\n"
             message += f"💡 使用方法：/add BTC ETH SOL\n\n"
             message += f"🔥 **热门币种**：\n"
-            for i, symbol in enumerate(hot_coins):
-                coin = symbol.replace('/USDT', '')
-                message += f"`{coin}` "
-                if (i + 1) % 6 == 0:
-                    message += "\n"
+            message += hot_coins_grid
             
             await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
             return
@@ -256,12 +760,9 @@ class EnhancedTelegramBot:
         added_coins = []
         invalid_coins = []
         
-        # 获取所有可用合约
-        all_contracts = await self.data_fetcher.fetch_all_contracts()
-        available_symbols = set()
-        for symbol in all_contracts:
-            available_symbols.add(symbol)
-            available_symbols.add(symbol.replace('/USDT', ''))  # 支持简写
+        # 获取所有可用合约（含简写）
+        await self._get_contracts_cached()
+        available_symbols = self._contracts_with_short
         
         for arg in context.args:
             coin = arg.upper()
@@ -269,7 +770,7 @@ class EnhancedTelegramBot:
             symbol = f"{coin}/USDT" if not coin.endswith('/USDT') else coin
             
             if symbol in available_symbols or coin in available_symbols:
-                self.user_watchlists[user_id].add(symbol)
+                self._watch(user_id, (symbol,))
                 added_coins.append(coin)
             else:
                 invalid_coins.append(coin)
@@ -283,11 +784,7 @@ class EnhancedTelegramBot:
         response += f"\n📊 当前关注数量：{len(self.user_watchlists[user_id])}"
         
         # 添加快速操作按钮
-        keyboard = [
-            [InlineKeyboardButton("📋 查看关注列表", callback_data="action_show_watchlist")],
-            [InlineKeyboardButton("🔔 信号设置", callback_data="action_settings")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self._add_result_keyboard
         
         await update.message.reply_text(response, reply_markup=reply_markup)
         
@@ -308,23 +805,22 @@ class EnhancedTelegramBot:
             
         removed_coins = []
         not_found_coins = []
+        watchlist = self.user_watchlists[user_id]
+        to_remove = set()
         
         for arg in context.args:
             coin = arg.upper()
-            symbol = f"{coin}/USDT"
-            
-            # 检查各种格式
-            removed = False
-            for watched_symbol in list(self.user_watchlists[user_id]):
-                if coin in watched_symbol or symbol == watched_symbol:
-                    self.user_watchlists[user_id].remove(watched_symbol)
-                    removed_coins.append(coin)
-                    removed = True
-                    break
-                    
-            if not removed:
+            # 与 /add 相同的标准化，关注列表中只存 X/USDT 形式
+            symbol = f"{coin}/USDT" if not coin.endswith('/USDT') else coin
+            
+            if symbol in watchlist and symbol not in to_remove:
+                to_remove.add(symbol)
+                removed_coins.append(coin)
+            elif symbol not in to_remove:
                 not_found_coins.append(coin)
         
+        self._unwatch(user_id, to_remove)
+        
         response = ""
         if removed_coins:
             response += f"✅ 已移除关注：{', '.join(removed_coins)}\n"
@@ -340,10 +836,7 @@ class EnhancedTelegramBot:
         user_id = update.effective_user.id
         
         if user_id not in self.user_watchlists or not self.user_watchlists[user_id]:
-            keyboard = [
-                [InlineKeyboardButton("⭐ 添加关注币种", callback_data="action_add_coins")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            reply_markup = self._watchlist_empty_keyboard
             
             await update.message.reply_text(
                 "📋 您的关注列表为空\n\n"
@@ -356,8 +849,7 @@ class EnhancedTelegramBot:
         message = f"⭐ **您的关注列表** ({len(watchlist)} 个币种)\n\n"
         
         for i, symbol in enumerate(watchlist, 1):
-            coin = symbol.replace('/USDT', '')
-            message += f"{i}. `{coin}` "
+            message += f"{i}. `{self._short(symbol)}` "
             if i % 5 == 0:
                 message += "\n"
         
@@ -365,11 +857,7 @@ class EnhancedTelegramBot:
         message += f"\n💡 使用 /clear 清空关注列表"
         
         # 添加管理按钮
-        keyboard = [
-            [InlineKeyboardButton("➕ 添加更多", callback_data="action_add_coins")],
-            [InlineKeyboardButton("🗑️ 清空列表", callback_data="action_clear_watchlist")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self._watchlist_keyboard
         
         await update.message.reply_text(
             message, 
@@ -386,7 +874,7 @@ class EnhancedTelegramBot:
             return
             
         count = len(self.user_watchlists[user_id])
-        self.user_watchlists[user_id].clear()
+        self._unwatch(user_id, self.user_watchlists[user_id])
         
         await update.message.reply_text(
             f"🗑️ 已清空关注列表 ({count} 个币种)\n\n"
@@ -399,25 +887,15 @@ class EnhancedTelegramBot:
         
         try:
             # 获取所有合约币种
-            all_contracts = await self.data_fetcher.fetch_all_contracts()
+            all_contracts = await self._get_contracts_cached()
             
             if not all_contracts:
                 await update.message.reply_text("❌ 获取币种列表失败，请稍后重试")
                 return
             
-            # 初始化用户关注列表
-            if user_id not in self.user_watchlists:
-                self.user_watchlists[user_id] = set()
-            
-            # 获取当前关注数量
-            original_count = len(self.user_watchlists[user_id])
-            
-            # 添加所有币种到关注列表
-            self.user_watchlists[user_id].update(all_contracts)
-            
-            # 计算新增数量
+            # 添加所有币种到关注列表（整批更新，只触发一次写盘）
+            added_count = self._watch(user_id, all_contracts)
             new_count = len(self.user_watchlists[user_id])
-            added_count = new_count - original_count
             
             # 格式化消息
             message = f"""
@@ -429,7 +907,7 @@ class EnhancedTelegramBot:
 • 当前关注：{new_count} 个
 
 💡 **热门币种**（前15个）：
-{' '.join([coin.replace('/USDT', '') for coin in all_contracts[:15]])}
+{self._hot_coins_text}
 
 ⚡ **信号设置**：
 现在您将收到所有 {new_count} 个币种的交易信号，包括：
@@ -441,17 +919,7 @@ class EnhancedTelegramBot:
             """
             
             # 添加管理按钮
-            keyboard = [
-                [
-                    InlineKeyboardButton("📋 查看列表", callback_data="action_show_watchlist"),
-                    InlineKeyboardButton("⚙️ 信号设置", callback_data="action_settings")
-                ],
-                [
-                    InlineKeyboardButton("🔥 热门币种", callback_data="action_hot_coins"),
-                    InlineKeyboardButton("🗑️ 清空列表", callback_data="action_clear_watchlist")
-                ]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            reply_markup = self._addall_done_keyboard
             
             await update.message.reply_text(
                 message, 
@@ -459,20 +927,20 @@ class EnhancedTelegramBot:
                 reply_markup=reply_markup
             )
             
-            self.logger.info(f"用户 {user_id} 一键关注了所有 {new_count} 个币种")
+            self.logger.info("用户 %s 一键关注了所有 %d 个币种", user_id, new_count)
             
         except Exception as e:
-            self.logger.error(f"一键关注所有币种失败: {e}")
+            self.logger.error("一键关注所有币种失败: %s", e)
             await update.message.reply_text("❌ 一键关注失败，请稍后重试")
         
     async def coin_query_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理币种查询命令 (/btc, /eth 等)"""
         command = update.message.text[1:].upper()  # 移除 / 并转大写
-        symbol = f"{command}/USDT"
         
-        # 检查是否为有效币种
-        all_contracts = await self.data_fetcher.fetch_all_contracts()
-        if symbol not in all_contracts:
+        # 检查是否为有效币种（合约列表命中内存缓存时无网络请求）
+        await self._get_contracts_cached()
+        symbol = self._short_to_full.get(command)
+        if symbol is None:
             await update.message.reply_text(
                 f"❌ 不支持的币种：{command}\n\n"
                 f"💡 使用 /pairs 查看支持的币种列表"
@@ -493,7 +961,9 @@ class EnhancedTelegramBot:
         symbol = f"{coin}/USDT"
         
         try:
-            ticker = await self.data_fetcher.fetch_ticker(symbol)
+            ticker = await self._singleflight(
+                ('ticker', symbol), lambda: self.data_fetcher.fetch_ticker(symbol)
+            )
             if ticker:
                 price_message = f"""
 💰 **{symbol} 价格信息**
@@ -507,10 +977,7 @@ class EnhancedTelegramBot:
                 """
                 
                 # 添加查看详细分析按钮
-                keyboard = [
-                    [InlineKeyboardButton("📊 技术分析", callback_data=f"analysis_{coin}")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = _price_keyboard(coin)
                 
                 await update.message.reply_text(
                     price_message, 
@@ -520,7 +987,7 @@ class EnhancedTelegramBot:
             else:
                 await update.message.reply_text(f"❌ 获取 {symbol} 价格失败")
         except Exception as e:
-            self.logger.error(f"查询价格失败: {e}")
+            self.logger.error("查询价格失败: %s", e)
             await update.message.reply_text("❌ 查询价格失败，请稍后重试")
             
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -544,15 +1011,7 @@ class EnhancedTelegramBot:
         """
         
         # 添加操作按钮
-        keyboard = []
-        if is_subscribed:
-            keyboard.append([InlineKeyboardButton("⚙️ 信号设置", callback_data="action_settings")])
-        else:
-            keyboard.append([InlineKeyboardButton("🔔 立即订阅", callback_data="action_subscribe")])
-            
-        keyboard.append([InlineKeyboardButton("⭐ 管理关注", callback_data="action_watchlist")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = self._status_subscribed_keyboard if is_subscribed else self._status_unsubscribed_keyboard
         
         await update.message.reply_text(
             status_message, 
@@ -563,16 +1022,12 @@ class EnhancedTelegramBot:
     async def pairs_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """显示支持的交易对列表"""
         try:
-            all_contracts = await self.data_fetcher.fetch_all_contracts()
+            all_contracts = await self._get_contracts_cached()
             
             message = f"📋 **支持的交易对** (共 {len(all_contracts)} 个)\n\n"
             message += "🔥 **热门币种**：\n"
             
-            for i, symbol in enumerate(all_contracts[:30]):
-                coin = symbol.replace('/USDT', '')
-                message += f"`{coin}` "
-                if (i + 1) % 6 == 0:
-                    message += "\n"
+            message += self._pairs_grid
             
             if len(all_contracts) > 30:
                 message += f"\n\n📊 还有 {len(all_contracts) - 30} 个其他币种...\n"
@@ -584,40 +1039,12 @@ class EnhancedTelegramBot:
             await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
             
         except Exception as e:
-            self.logger.error(f"获取交易对列表失败: {e}")
+            self.logger.error("获取交易对列表失败: %s", e)
             await update.message.reply_text("❌ 获取交易对列表失败")
             
     async def channels_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """显示频道信息"""
-        message = f"""
-📺 **官方频道配置**
-
-🔥 **主信号频道**：{self.main_channel}
-• 极强信号推送（80%+ 置信度）
-• 强信号推送（65%+ 置信度）
-• 适合主力资金介入的高质量信号
-
-⚠️ **副信号频道**：{self.detail_channel}  
-• 中信号推送（50%+ 置信度）
-• 增强弱信号推送（有突破迹象）
-• 谨慎对待，适合小仓试探
-
-💡 **信号分级说明**：
-🔥 极强信号 - 强烈推荐，适合主力资金
-✅ 强信号 - 可交易，需看大盘趋势  
-⚠️ 中信号 - 谨慎对待，小仓试探
-🟡 增强弱信号 - 有突破迹象，仅供观察
-
-📋 **使用建议**：
-• 新手：重点关注主频道的🔥极强信号
-• 专业：同时关注两个频道，灵活操作
-• 保守：只关注主频道的高质量信号
-
-💬 **私聊功能**：
-使用机器人私聊获得个性化服务和详细分析
-        """
-        
-        await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN)
+        await update.message.reply_text(self._channels_message, parse_mode=ParseMode.HTML)
         
     async def handle_callback_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """处理内联按钮回调"""
@@ -629,7 +1056,7 @@ class EnhancedTelegramBot:
         
         if action == "action_subscribe":
             if user_id not in self.subscribers:
-                self.subscribers.add(user_id)
+                self._subscribe(user_id)
                 await query.edit_message_text(
                     "🎉 **订阅成功！**\n\n您将收到高质量交易信号推送。",
                     parse_mode=ParseMode.MARKDOWN
@@ -640,26 +1067,22 @@ class EnhancedTelegramBot:
         elif action == "action_addall":
             try:
                 # 获取所有合约币种
-                all_contracts = await self.data_fetcher.fetch_all_contracts()
+                all_contracts = await self._get_contracts_cached()
                 if all_contracts:
-                    # 清理用户现有关注列表
-                    if user_id not in self.user_settings:
-                        self.user_settings[user_id] = {}
-                    self.user_settings[user_id]['watchlist'] = [
-                        coin.replace('/USDT', '') for coin in all_contracts
-                    ]
+                    # 与 /addall 一致，写入关注列表及反向索引
+                    self._watch(user_id, all_contracts)
                     
                     await query.edit_message_text(
                         f"🔥 **一键关注成功！**\n\n"
                         f"已添加 **{len(all_contracts)}** 个币种到您的关注列表。\n\n"
-                        f"包括：{', '.join([coin.replace('/USDT', '') for coin in all_contracts[:10]])}...\n\n"
+                        f"包括：{self._addall_preview}...\n\n"
                         f"使用 /watchlist 查看完整列表。",
                         parse_mode=ParseMode.MARKDOWN
                     )
                 else:
                     await query.edit_message_text("❌ 获取币种列表失败，请稍后重试。")
             except Exception as e:
-                self.logger.error(f"一键关注失败: {e}")
+                self.logger.error("一键关注失败: %s", e)
                 await query.edit_message_text("❌ 一键关注失败，请稍后重试。")
         
         # 处理信号详情查看
@@ -677,14 +1100,14 @@ class EnhancedTelegramBot:
             
         elif action == "action_help":
             await query.edit_message_text(
-                "📚 **快速帮助**\n\n"
+                "📚 <b>快速帮助</b>\n\n"
                 "🔔 /subscribe - 订阅信号\n"
                 "🔥 /addall - 一键关注所有币种\n"
                 "⭐ /add BTC ETH - 添加关注\n"
                 "🔍 /btc - 查看BTC分析\n"
                 "💰 /price BTC - 查看价格\n\n"
                 "💡 发送 /help 查看完整帮助",
-                parse_mode=ParseMode.MARKDOWN
+                parse_mode=ParseMode.HTML
             )
             
         else:
@@ -693,8 +1116,8 @@ class EnhancedTelegramBot:
     async def show_signal_details(self, query, signal_id: str):
         """显示信号详情"""
         try:
-            if signal_id in self.signal_cache:
-                signal_info = self.signal_cache[signal_id]
+            signal_info = self.signal_cache.get(signal_id)
+            if signal_info is not None:
                 symbol = signal_info['symbol']
                 data = signal_info['data']
                 detailed_analysis = signal_info['detailed_analysis']
@@ -744,7 +1167,7 @@ class EnhancedTelegramBot:
                 await query.edit_message_text("❌ 信号详情已过期或不存在。")
                 
         except Exception as e:
-            self.logger.error(f"显示信号详情失败: {e}")
+            self.logger.error("显示信号详情失败: %s", e)
             await query.edit_message_text("❌ 获取详情失败，请稍后重试。")
     
     async def show_symbol_analysis(self, query, symbol: str):
@@ -753,16 +1176,28 @@ class EnhancedTelegramBot:
             # 添加 USDT 后缀
             full_symbol = f"{symbol}/USDT"
             
-            # 获取实时数据并分析
-            df = await self.data_fetcher.fetch_ohlcv(full_symbol, '1m', 100)
+            # 获取实时数据并分析（列式数组，不在事件循环上构建DataFrame）
+            ohlcv = await self._singleflight(
+                ('ohlcv', full_symbol, '1m', 100),
+                lambda: self.data_fetcher.fetch_ohlcv(full_symbol, '1m', 100, as_frame=False)
+            )
             
-            if df is not None and len(df) >= 50:
-                # 使用简化的信号分析
-                analysis_result = self._analyze_symbol_simple(full_symbol, df)
+            if ohlcv is not None and len(ohlcv['close']) >= 50:
+                # 使用简化的信号分析（最新K线未变化时直接复用结果）
+                close = ohlcv['close']
+                cache_key = (full_symbol, int(ohlcv['ts'][-1]), close[-1])
+                analysis_result = self._analysis_cache.get(cache_key)
+                if analysis_result is None:
+                    analysis_result = self._analyze_symbol_simple(full_symbol, close)
+                    self._analysis_cache[cache_key] = analysis_result
                 
                 # 获取当前价格
-                current_price = df['close'].iloc[-1]
-                price_change = ((current_price - df['close'].iloc[-24]) / df['close'].iloc[-24]) * 100
+                current_price = close[-1]
+                price_change = ((current_price - close[-24]) / close[-24]) * 100
+                
+                # 分析失败时RSI为 'N/A'，格式化需在f-string之外判断
+                rsi = analysis_result['rsi']
+                rsi_text = f"{rsi:.1f}" if isinstance(rsi, (int, float)) else str(rsi)
                 
                 analysis_message = f"""
 📊 **{symbol} 实时分析**
@@ -775,7 +1210,7 @@ class EnhancedTelegramBot:
 📈 方向: {analysis_result['direction']}
 
 🔍 **技术指标**:
-• 当前RSI: {analysis_result['rsi']:.1f if isinstance(analysis_result['rsi'], (int, float)) else analysis_result['rsi']}
+• 当前RSI: {rsi_text}
 • 价格趋势: {analysis_result['trend']}
 • 价格变化: {analysis_result['price_change']:.2f}%
 
@@ -785,12 +1220,7 @@ class EnhancedTelegramBot:
 """
                 
                 # 添加操作按钮
-                keyboard = [
-                    [InlineKeyboardButton("📈 查看永续合约K线", url=f"https://www.okx.com/trade-swap/{symbol.lower()}-usdt-swap")],
-                    [InlineKeyboardButton("⭐ 添加关注", callback_data=f"watch_{symbol}")],
-                    [InlineKeyboardButton("🔄 刷新分析", callback_data=f"analysis_{symbol}")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
+                reply_markup = _analysis_keyboard(symbol)
                 
                 await query.edit_message_text(
                     analysis_message,
@@ -801,7 +1231,7 @@ class EnhancedTelegramBot:
                 await query.edit_message_text(f"❌ 获取 {symbol} 数据失败，请稍后重试。")
                 
         except Exception as e:
-            self.logger.error(f"显示币种分析失败: {e}")
+            self.logger.error("显示币种分析失败: %s", e)
             await query.edit_message_text("❌ 分析失败，请稍后重试。")
         
     async def _show_watchlist_inline(self, query):
@@ -812,37 +1242,26 @@ class EnhancedTelegramBot:
         if not watchlist:
             message = "📋 关注列表为空\n\n💡 使用 /add 币种名 添加关注"
         else:
-            coins = [symbol.replace('/USDT', '') for symbol in watchlist]
+            coins = [self._short(symbol) for symbol in watchlist]
             message = f"⭐ **关注列表** ({len(coins)} 个)\n\n"
             message += " • ".join(coins)
             
         await query.edit_message_text(message, parse_mode=ParseMode.MARKDOWN)
     
-    def _analyze_symbol_simple(self, symbol: str, df):
-        """简化的信号分析方法"""
-        try:
-            import pandas as pd
-            import numpy as np
-            
-            # 获取基本数据
-            close_prices = df['close']
-            
-            # 计算RSI
-            delta = close_prices.diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
-            current_rsi = rsi.iloc[-1]
-            
-            # 计算移动平均线
-            ma_fast = close_prices.rolling(window=7).mean().iloc[-1]
-            ma_slow = close_prices.rolling(window=21).mean().iloc[-1]
+    def _analyze_symbol_simple(self, symbol: str, close: np.ndarray):
+        """
+        简化的信号分析方法（只计算最新一根K线的指标，不构造中间DataFrame）
+        
+        Args:
+            symbol: 交易对
+            close: 收盘价数组（按时间升序）
             
-            # 价格变化
-            current_price = close_prices.iloc[-1]
-            prev_price = close_prices.iloc[-2]
-            price_change = (current_price - prev_price) / prev_price * 100
+        Returns:
+            dict: confidence, direction, rsi, trend, price_change
+        """
+        try:
+            # RSI（最近14个涨跌幅的简单平均）、7/21均线与最新涨跌幅，由JIT内核单次计算
+            current_rsi, ma_fast, ma_slow, price_change = simple_rsi_ma(close, 14, 7, 21)
             
             # 简单信号逻辑
             confidence = 0
@@ -877,7 +1296,7 @@ class EnhancedTelegramBot:
             }
             
         except Exception as e:
-            self.logger.error(f"简化分析失败: {e}")
+            self.logger.error("简化分析失败: %s", e)
             return {
                 'confidence': 0,
                 'direction': 'NEUTRAL',
@@ -901,29 +1320,46 @@ class EnhancedTelegramBot:
                 BotCommand("status", "📊 查看状态"),
                 BotCommand("pairs", "📋 支持币种"),
             ]
+            # 初始化（内部调用 get_me）放在首个API请求之前，顺带预热到Bot API的连接
+            await self.app.initialize()
             await self.app.bot.set_my_commands(commands)
             
             # 启动机器人
-            await self.app.initialize()
             await self.app.start()
             await self.app.updater.start_polling()
             
+            if not self._send_tasks:
+                self._send_tasks = [asyncio.create_task(self._send_worker()) for _ in range(SEND_WORKERS)]
+            if self._stats_task is None:
+                self._stats_task = asyncio.create_task(self._stats_flusher())
+            
             self.logger.info("🚀 增强版Telegram机器人启动成功")
             
         except Exception as e:
-            self.logger.error(f"启动机器人失败: {e}")
+            self.logger.error("启动机器人失败: %s", e)
             raise
             
     async def stop(self):
-        """停止机器人"""
+        """停止机器人（未启动或已停止时只释放数据连接，可重复调用）"""
         try:
             if self.app.updater.running:
                 await self.app.updater.stop()
-            await self.app.stop()
-            await self.app.shutdown()
+            if self.app.running:
+                await self.app.stop()
+                await self.app.shutdown()
+            for task in self._send_tasks:
+                task.cancel()
+            await asyncio.gather(*self._send_tasks, return_exceptions=True)
+            self._send_tasks.clear()
+            if self._stats_task is not None:
+                self._stats_task.cancel()
+                self._stats_task = None
+            self._log_stats()
+            self._flush_state()
+            await self.data_fetcher.close()
             self.logger.info("增强版Telegram机器人已停止")
         except Exception as e:
-            self.logger.error(f"停止机器人失败: {e}")
+            self.logger.error("停止机器人失败: %s", e)
             
     def get_subscriber_count(self):
         """获取订阅用户数量"""
@@ -931,150 +1367,69 @@ class EnhancedTelegramBot:
 
     async def broadcast_signal(self, message: str, symbol: str, signal_data: dict, priority: str = 'LOW'):
         """广播信号 - 支持科学分级推送"""
-        try:
-            # 🎯 科学分级置信度系统配置
-            priority_config = {
-                'EXTREME': {
-                    'emoji': '🔥',
-                    'title': '极强信号',
-                    'description': '强烈关注，适合主力资金介入',
-                    'channel': self.main_channel,  # 高频频道
-                    'urgent': True,
-                    'confidence_range': '80-100%'
-                },
-                'HIGH': {
-                    'emoji': '✅',
-                    'title': '强信号',
-                    'description': '可交易，但仍需看大盘与趋势',
-                    'channel': self.main_channel,  # 高频频道
-                    'urgent': False,
-                    'confidence_range': '65-80%'
-                },
-                'MEDIUM': {
-                    'emoji': '⚠️',
-                    'title': '中信号',
-                    'description': '谨慎对待，仅适合小仓试探',
-                    'channel': self.detail_channel,  # 中频频道
-                    'urgent': False,
-                    'confidence_range': '50-65%'
-                },
-                'LOW_ENHANCED': {
-                    'emoji': '🟡',
-                    'title': '弱信号',
-                    'description': '暂不建议直接交易，可观察',
-                    'channel': self.detail_channel,  # 中频频道
-                    'urgent': False,
-                    'confidence_range': '35-50%'
-                },
-                'NOISE': {
-                    'emoji': '❌',
-                    'title': '噪音信号',
-                    'description': '回测中表现差，已过滤',
-                    'channel': None,  # 不推送到任何频道
-                    'urgent': False,
-                    'confidence_range': '0-35%'
-                }
-            }
-            
-            config = priority_config.get(priority, priority_config['NOISE'])
+        # 🛑 NOISE信号不推送到任何频道或用户
+        if priority == 'NOISE':
+            self._stats['noise'] += 1
+            return
             
-            # 🛑 NOISE信号不推送到任何频道或用户
-            if priority == 'NOISE':
-                self.logger.info(f"过滤NOISE信号: {symbol} (置信度过低)")
-                return
+        try:
+            config = _PRIORITY_CONFIG.get(priority, _PRIORITY_CONFIG['NOISE'])
+            channel = getattr(self, config['channel_attr']) if config['channel_attr'] else None
             
             # 格式化信号消息
             confidence = signal_data.get('confidence', 0)
             direction = signal_data.get('direction', 'UNKNOWN')
             entry_price = signal_data.get('entry_price', 0)
+            now = time.time()  # 消息时间、信号ID与缓存时间戳共用同一时刻
+            coin = self._short(symbol)
             
             # 创建简洁的信号消息
-            brief_message = f"""{config['emoji']} <b>{config['title']}</b> - {symbol.replace('/USDT', '')}
+            brief_message = f"""{config['emoji']} <b>{config['title']}</b> - {html.escape(coin)}
 
-📊 <b>方向</b>: {direction}
+📊 <b>方向</b>: {html.escape(direction)}
 🎯 <b>置信度</b>: {confidence:.1%}
 💰 <b>入场价</b>: ${entry_price:.4f}
 📋 <b>建议</b>: {config['description']}
 
-⏰ {datetime.now().strftime('%H:%M:%S')}"""
+⏰ {time.strftime(_TIME_FMT, time.localtime(now))}"""
             
             # 创建内联按钮
-            signal_id = f"{symbol}_{direction}_{int(time.time())}"
+            signal_id = f"{symbol}_{direction}_{int(now)}"
             self.signal_cache[signal_id] = {
                 'symbol': symbol,
                 'data': signal_data,
                 'detailed_analysis': message,
-                'timestamp': time.time(),
+                'timestamp': now,
                 'priority': priority
             }
             
-            keyboard = [
-                [InlineKeyboardButton("🔍 查看详情", callback_data=f"details_{signal_id}")],
-                [InlineKeyboardButton(f"📊 {symbol.replace('/USDT', '')} 分析", callback_data=f"analysis_{symbol.replace('/USDT', '')}")]
-            ]
-            
-            if config['urgent']:
-                keyboard.insert(0, [InlineKeyboardButton("⚡ 立即查看永续合约", url=f"https://www.okx.com/trade-swap/{symbol.replace('/USDT', '-usdt-swap').lower()}")])
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
+            # 只有详情按钮随信号变化，其余按钮行按交易对复用；同一个 reply_markup 实例发给所有接收者
+            reply_markup = InlineKeyboardMarkup(_signal_keyboard_rows(symbol, signal_id, config['urgent']))
             
             # 发送到配置的频道（如果配置了频道）
-            if config['channel']:
-                try:
-                    await self.app.bot.send_message(
-                        chat_id=config['channel'],
-                        text=brief_message,
-                        parse_mode=ParseMode.HTML,
-                        reply_markup=reply_markup
-                    )
-                    self.logger.info(f"成功发送 {symbol} {priority} 信号到频道")
-                except Exception as e:
-                    self.logger.error(f"发送到频道失败: {e}")
-            else:
-                self.logger.info(f"跳过频道发送（{priority} 信号不推送到频道）")
+            if channel and self._enqueue_message(channel, brief_message, reply_markup):
+                self._stats['channel'] += 1
             
             # 发送给已订阅的用户（根据用户设置过滤）
-            successful_sends = 0
+            queued_sends = 0
             total_subscribers = len(self.subscribers)
             
-            for user_id in list(self.subscribers):
-                try:
-                    # 检查用户的信号质量偏好
-                    user_settings = self.user_settings.get(user_id, {})
-                    notification_level = user_settings.get('notification_level', 'HIGH')
-                    watchlist_only = user_settings.get('watchlist_only', False)
-                    user_watchlist = user_settings.get('watchlist', [])
-                    
-                    # 信号质量过滤
-                    should_send = False
-                    if notification_level == 'ALL':
-                        should_send = priority in ['EXTREME', 'HIGH', 'MEDIUM', 'LOW_ENHANCED']
-                    elif notification_level == 'HIGH':
-                        should_send = priority in ['EXTREME', 'HIGH']
-                    elif notification_level == 'MEDIUM':
-                        should_send = priority in ['EXTREME', 'HIGH', 'MEDIUM']
-                    
-                    # 关注列表过滤
-                    if watchlist_only and user_watchlist:
-                        coin_symbol = symbol.replace('/USDT', '')
-                        if coin_symbol not in user_watchlist:
-                            should_send = False
-                    
-                    if should_send:
-                        await self.app.bot.send_message(
-                            chat_id=user_id,
-                            text=brief_message,
-                            parse_mode=ParseMode.HTML,
-                            reply_markup=reply_markup
-                        )
-                        successful_sends += 1
-                        
-                except Exception as e:
-                    self.logger.warning(f"发送给用户 {user_id} 失败: {e}")
-                    if "bot was blocked" in str(e).lower():
-                        self.subscribers.discard(user_id)
-            
-            self.logger.info(f"信号广播完成: {successful_sends}/{total_subscribers} 用户")
+            # 按通知级别索引取接收者，再剔除开启了“仅关注列表”但未关注该交易对的用户
+            recipients = set().union(*(self._subs_by_level[level] for level in _LEVELS_FOR_PRIORITY.get(priority, ())))
+            if self._watchlist_only:
+                watchers = self.symbol_subscribers.get(symbol, ())
+                recipients.difference_update([
+                    user_id for user_id in self._watchlist_only
+                    if self.user_watchlists.get(user_id) and user_id not in watchers
+                ])
+            
+            for user_id in recipients:
+                if self._enqueue_message(user_id, brief_message, reply_markup):
+                    queued_sends += 1
+            
+            self._stats['signals'] += 1
+            self._stats['queued'] += queued_sends
+            self.logger.debug("信号广播完成: %s %s, %d/%d 用户已加入发送队列", symbol, priority, queued_sends, total_subscribers)
             
         except Exception as e:
-            self.logger.error(f"广播信号失败: {e}") 
\ No newline at end of file
+            self.logger.error("广播信号失败: %s", e) 
\ No newline at end of file